@@ -0,0 +1,88 @@
+"""
+Accept/Deny detector benchmark on synthetic frames.
+
+Compares the original pixel-loop scan with the vectorized ButtonScanner.
+Run from the backend folder:  python benchmarks/bench_detector.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_vision import ButtonScanner
+
+SIZES = [(1920, 1080), (2560, 1440), (3840, 2160)]
+ROUNDS = 20
+
+
+def legacy_detect(screenshot):
+    """The pre-NumPy implementation, kept here as the baseline."""
+    width, height = screenshot.size
+    pixels = screenshot.load()
+    search_left = int(width * 0.5)
+    search_top = int(height * 0.2)
+    green_pos = None
+    red_pos = None
+    for y in range(search_top, height, 20):
+        for x in range(search_left, width, 20):
+            r, g, b = pixels[x, y][:3]
+            if g > 150 and g > r * 1.5 and g > b * 1.5: green_pos = (x, y)
+            if r > 150 and r > g * 1.5 and r > b * 1.5: red_pos = (x, y)
+            if green_pos and red_pos: break
+        if green_pos and red_pos: break
+    if green_pos and red_pos:
+        return {"accept_pos": green_pos, "deny_pos": red_pos}
+    return None
+
+
+def make_frame(size, with_buttons):
+    """Dark IDE-like frame, optionally with an Accept/Deny pair bottom-right."""
+    width, height = size
+    img = Image.new("RGB", size, "#1e1e1e")
+    d = ImageDraw.Draw(img)
+    d.rectangle((0, 0, width, 30), fill="#323233")                 # title bar
+    d.rectangle((int(width * 0.7), 30, width, height), fill="#252526")  # chat panel
+    for i in range(40, height - 40, 24):                           # fake text lines
+        d.line((60, i, 60 + (i * 37) % (width // 2), i), fill="#9cdcfe", width=2)
+    if with_buttons:
+        x, y = int(width * 0.78), int(height * 0.82)
+        d.rectangle((x, y, x + 110, y + 36), fill="#2ea043")       # Accept
+        d.rectangle((x + 130, y, x + 240, y + 36), fill="#da3633")  # Deny
+    return img
+
+
+def timeit(fn, frame, rounds=ROUNDS):
+    fn(frame)  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(frame)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    print(f"{'frame':>11} | {'case':<10} | {'legacy ms':>9} | {'numpy ms':>9} | {'cached ms':>9}")
+    print("-" * 62)
+    for size in SIZES:
+        for with_buttons in (False, True):
+            frame = make_frame(size, with_buttons)
+            cold = ButtonScanner()
+            legacy_ms = timeit(legacy_detect, frame)
+            numpy_ms = timeit(lambda f: (cold.reset(), cold.scan(f)), frame)
+            warm = ButtonScanner()
+            warm.scan(frame)
+            cached_ms = timeit(warm.scan, frame)
+
+            expected = legacy_detect(frame)
+            found = warm.scan(frame)
+            assert (expected is None) == (found is None), "detector disagreement"
+
+            case = "buttons" if with_buttons else "idle"
+            label = f"{size[0]}x{size[1]}"
+            print(f"{label:>11} | {case:<10} | {legacy_ms:9.2f} | {numpy_ms:9.2f} | {cached_ms:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
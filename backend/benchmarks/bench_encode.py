@@ -0,0 +1,82 @@
+"""
+Screenshot encoder benchmark: encode time and size per format.
+
+Frames are IDE-like (text on flat panels) and photo-like (gradients and
+noise, e.g. an image preview), at 1080p and a high-DPI 4K desktop. Fixed
+formats are encoded from the full frame like the old Image.save(path)
+(PNG) and at Telegram's photo size; AdaptiveEncoder's quality and fast
+modes pick format / quality against their byte budget and time target.
+Run from the backend folder:  python benchmarks/bench_encode.py [--rounds N]
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_media import AdaptiveEncoder, fit, save
+from bench_media import ide_frame
+
+SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+
+
+def photo_frame(size) -> Image.Image:
+    width, height = size
+    rng = np.random.default_rng(5)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rgb = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    rgb += rng.normal(0, 12, rgb.shape)
+    return Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8))
+
+
+def png_full(frame) -> bytes:
+    buf = io.BytesIO()
+    frame.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def timed(fn, rounds: int) -> tuple:
+    result = fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode time and size per screenshot format")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'frame':<12} | {'encoder':<28} | {'ms':>7} | {'KiB':>7}")
+    print("-" * 64)
+    for size_label, size in SIZES.items():
+        for kind, frame in (("ide", ide_frame(size, 1)), ("photo", photo_frame(size))):
+            small = lambda: fit(frame.convert("RGB"), 1280)
+            cases = {
+                "png full (legacy)": lambda: png_full(frame),
+                "png 1280": lambda: png_full(small()),
+                "png8 1280": lambda: save(small(), "png8"),
+                "jpeg q85 1280": lambda: save(small(), "jpeg", 85),
+                "webp q80 1280": lambda: save(small(), "webp", 80),
+            }
+            label = f"{size_label} {kind}"
+            for name, fn in cases.items():
+                ms, data = timed(fn, args.rounds)
+                print(f"{label:<12} | {name:<28} | {ms:7.1f} | {len(data) / 1024:7.0f}")
+            for mode in ("quality", "fast"):
+                encoder = AdaptiveEncoder()
+                ms, result = timed(lambda: encoder.encode(frame, mode), args.rounds)
+                name = f"adaptive {mode} ({result['format']} q{result['quality']})"
+                print(f"{label:<12} | {name:<28} | {ms:7.1f} | {result['size'] / 1024:7.0f}")
+            print("-" * 64)
+
+
+if __name__ == "__main__":
+    main()
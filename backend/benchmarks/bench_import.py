@@ -0,0 +1,66 @@
+"""
+Cold-start benchmark: milliseconds per module imported.
+
+Each target is imported in a fresh interpreter with `python -X importtime`
+and the report is parsed, so numbers are comparable between runs. By
+default it measures ghostsync_core (import only, which must stay cheap)
+and then each dependency that ghostsync_core.init() loads.
+Run from the backend folder:  python benchmarks/bench_import.py [module ...] [--top N]
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+DEFAULT_TARGETS = [
+    "ghostsync_core",
+    # loaded by init() / import_dependencies()
+    "ghostsync_vision",
+    "PIL.Image",
+    "pyperclip",
+    "pyautogui",
+    "telegram.ext",
+    "ghostsync_gui",
+]
+
+
+def import_times(module: str) -> tuple:
+    """Returns (rows, error) where rows are (name, depth, self_ms, cumulative_ms)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line: continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    error = None
+    if proc.returncode:
+        error = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+    return rows, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_TARGETS)
+    parser.add_argument("--top", type=int, default=8, help="heaviest modules listed per target")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        rows, error = import_times(module)
+        total = next((cum for name, depth, _, cum in rows if name == module and depth == 1), None)
+        if total is None:
+            total = sum(cum for _, depth, _, cum in rows if depth == 1)
+        status = f"  ({error})" if error else ""
+        print(f"{module:<18} {total:8.1f} ms  {len(rows):4d} modules{status}")
+        for name, _, self_ms, cum_ms in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+            print(f"    {name:<40} self {self_ms:7.1f} ms   cumulative {cum_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Outbound photo benchmark: full-resolution PNG uploads vs MediaSender.
+
+A session of bot replies (project open, prompt results, repeated frames
+when nothing changed on screen, before/after pairs) is sent through a fake
+Bot API whose upload time is bytes / uplink rate plus a fixed round trip.
+Legacy sends a fresh full-resolution PNG every time (one call per photo);
+MediaSender sends downscaled JPEG bytes, re-sends repeated frames by
+file_id and pairs go out as one send_media_group call.
+The uploads are simulated in real time, so a run takes a few minutes.
+Run from the backend folder:  python benchmarks/bench_media.py [--width 2560 --height 1440]
+"""
+
+import argparse
+import asyncio
+import io
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_media import MediaSender
+
+RTT = 0.15                      # seconds per Bot API call
+UPLINKS = {"1 Mbit/s": 1_000_000 / 8, "256 kbit/s": 256_000 / 8}  # bytes per second
+WORDS = "def async await return import class self frame log tunnel port sync".split()
+
+
+def ide_frame(size, seed: int) -> Image.Image:
+    """Dark IDE-like frame with real glyphs (text dominates screenshot entropy)."""
+    rng = random.Random(seed)
+    width, height = size
+    img = Image.new("RGB", size, "#1e1e1e")
+    d = ImageDraw.Draw(img)
+    d.rectangle((0, 0, width, 30), fill="#323233")
+    d.rectangle((int(width * 0.7), 30, width, height), fill="#252526")
+    for y in range(40, height - 20, 18):
+        for panel, (x0, x1) in enumerate(((20, int(width * 0.68)), (int(width * 0.72), width - 20))):
+            x = x0 + rng.randint(0, 6) * 16
+            while x < x1 - 120 and rng.random() < 0.85:
+                word = rng.choice(WORDS)
+                d.text((x, y), word, fill=rng.choice(("#9cdcfe", "#ce9178", "#dcdcaa", "#c586c0")))
+                x += 8 * len(word) + 8
+    return img
+
+
+class FakeBot:
+    """Counts calls and bytes; answers like the Bot API (photo sizes with a file_id)."""
+
+    def __init__(self, uplink: float):
+        self.uplink = uplink
+        self.calls = 0
+        self.bytes = 0
+        self.ids = 0
+
+    def _photo(self):
+        self.ids += 1
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"small{self.ids}"), SimpleNamespace(file_id=f"id{self.ids}")])
+
+    async def _upload(self, payloads):
+        size = sum(len(p.getvalue()) if isinstance(p, io.BytesIO) else len(p) if isinstance(p, bytes) else 0
+                   for p in payloads)
+        self.calls += 1
+        self.bytes += size
+        await asyncio.sleep(RTT + size / self.uplink)
+
+    async def send_photo(self, photo, **kwargs):
+        await self._upload([photo])
+        return self._photo()
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        await self._upload([m.media.input_file_content if hasattr(m.media, "input_file_content") else m.media
+                            for m in media])
+        return [self._photo() for _ in media]
+
+
+def png(frame) -> io.BytesIO:
+    buf = io.BytesIO()
+    frame.save(buf, format="PNG")
+    buf.seek(0)
+    return buf
+
+
+async def run(size):
+    frames = {n: ide_frame(size, n) for n in range(6)}
+    # (kind, frames): open, prompts, a repeat of an unchanged screen, before/after pairs
+    session = [("photo", [0]), ("photo", [1]), ("photo", [2]), ("photo", [2]), ("pair", [2, 3]),
+               ("photo", [0]), ("pair", [3, 4]), ("photo", [5]), ("photo", [5])]
+    pngs = {n: png(f).getvalue() for n, f in frames.items()}
+    print(f"frame {size[0]}x{size[1]}: PNG {sum(map(len, pngs.values())) / len(pngs) / 1024:.0f} KiB avg")
+    print(f"{'uplink':<10} | {'path':<7} | {'calls':>5} | {'KiB sent':>8} | {'s/reply':>7} | {'max s':>6}")
+    print("-" * 58)
+    for label, rate in UPLINKS.items():
+        for path in ("legacy", "media"):
+            bot = FakeBot(rate)
+            sender = MediaSender()
+            latencies = []
+            for kind, ids in session:
+                t0 = time.perf_counter()
+                if path == "legacy":
+                    for n in ids:
+                        await bot.send_photo(io.BytesIO(pngs[n]))
+                elif kind == "pair":
+                    await sender.send_pair(bot, 42, frames[ids[0]], frames[ids[1]], caption="done")
+                else:
+                    await sender.send_photo(bot.send_photo, frames[ids[0]], caption="done")
+                latencies.append(time.perf_counter() - t0)
+            print(f"{label:<10} | {path:<7} | {bot.calls:5d} | {bot.bytes / 1024:8.0f} | "
+                  f"{sum(latencies) / len(latencies):7.2f} | {max(latencies):6.2f}")
+            if path == "media":
+                st = sender.stats()
+                print(f"{'':<10} | {'':<7} | {st['uploads']} uploads, {st['reused']} re-sent by file_id")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full PNG uploads vs MediaSender")
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    args = parser.parse_args()
+    asyncio.run(run((args.width, args.height)))
+
+
+if __name__ == "__main__":
+    main()
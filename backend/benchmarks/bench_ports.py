@@ -0,0 +1,93 @@
+"""
+Dev-server discovery benchmark.
+
+Opens a few listening sockets among 64 candidate ports, then times the
+legacy approach (netstat through the shell, substring match, serial 0.5 s
+probes) against PortDiscovery (per-line table parse, concurrent probes,
+TTL cache). On Windows a refused localhost connect costs ~1 s of SYN
+retries, so the serial path is far slower there than on Linux.
+Run from the backend folder:  python benchmarks/bench_ports.py
+"""
+
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_tunnel import PortDiscovery
+
+
+def free_block(count):
+    """Find `count` consecutive ports that are currently free."""
+    for base in range(42000, 60000, count):
+        socks = []
+        try:
+            for p in range(base, base + count):
+                s = socket.socket()
+                s.bind(("127.0.0.1", p))
+                socks.append(s)
+            return base
+        except OSError:
+            continue
+        finally:
+            for s in socks: s.close()
+    raise RuntimeError("no free port block")
+
+
+def legacy_discover(ports):
+    """The pre-PortDiscovery logic, applied to the same candidates."""
+    try:
+        out = subprocess.run(["netstat", "-ano"], capture_output=True, text=True, shell=True).stdout
+    except Exception:
+        out = ""
+    for port in ports:
+        if f":{port}" in out and "LISTENING" in out:
+            return port
+    for port in ports:  # then the serial readiness loop
+        with socket.socket() as s:
+            s.settimeout(0.5)
+            if s.connect_ex(("localhost", port)) == 0:
+                return port
+    return None
+
+
+def main():
+    base = free_block(64)
+    ports = list(range(base, base + 64))
+    servers = []
+    for p in (ports[40], ports[50], ports[63]):
+        s = socket.socket()
+        s.bind(("127.0.0.1", p))
+        s.listen()
+        servers.append(s)
+
+    t0 = time.perf_counter()
+    legacy = legacy_discover(ports)
+    legacy_ms = (time.perf_counter() - t0) * 1000
+
+    discovery = PortDiscovery(ttl=5)
+    t0 = time.perf_counter()
+    cold = discovery.discover_sync(ports)
+    cold_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    cached = discovery.discover_sync(ports)
+    cached_ms = (time.perf_counter() - t0) * 1000
+
+    probe_only = PortDiscovery(ttl=0)
+    probe_only.listening_ports = lambda: None  # force probing all 64 candidates
+    t0 = time.perf_counter()
+    probed = probe_only.discover_sync(ports)
+    probe_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"64 candidates, servers on {ports[40]}, {ports[50]}, {ports[63]}")
+    print(f"  legacy (netstat + serial probes) : {legacy_ms:8.1f} ms -> {legacy}")
+    print(f"  PortDiscovery cold               : {cold_ms:8.1f} ms -> {cold}")
+    print(f"  PortDiscovery cached             : {cached_ms:8.3f} ms -> {cached}")
+    print(f"  concurrent probe of all 64       : {probe_ms:8.1f} ms -> {probed}")
+    for s in servers: s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Prompt entry benchmark: fixed sleeps vs readiness waits, on a fake screen.
+
+The fake chat input reacts to every action after a random IDE latency and
+has a blinking caret the whole time. The fixed pipeline sleeps the old
+per-step delays (3.5 s in total) and misfires whenever the IDE is slower
+than the sleep; the event-driven pipeline polls wait_until + StabilityTracker
+exactly like AntigravityController does.
+Run from the backend folder:  python benchmarks/bench_readiness.py [--prompts N]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_timing import wait_until
+from ghostsync_vision import StabilityTracker
+
+# (step, old fixed sleep) - focus, center click, Ctrl+I, input click, clear, paste, submit
+STEPS = [("focus", 0.5), ("click_center", 0.3), ("open_chat", 1.0), ("click_input", 0.3),
+         ("clear", 0.4), ("paste", 0.5), ("submit", 0.5)]
+PROFILES = {"fast": (0.02, 0.08), "typical": (0.1, 0.3), "slow": (0.4, 1.5)}
+TIMEOUT = 3.0
+POLL = 0.05
+
+
+class FakeScreen:
+    """Chat-input region whose content changes `latency` s after each action."""
+
+    SIZE = (700, 130)
+
+    def __init__(self):
+        self.state = 0
+        self.pending = None  # (state, due)
+        self.cache = {}
+
+    def act(self, latency: float):
+        self.pending = (self.state + 1, time.monotonic() + latency)
+
+    def capture(self) -> Image.Image:
+        now = time.monotonic()
+        if self.pending and now >= self.pending[1]:
+            self.state, self.pending = self.pending[0], None
+        caret = int(now * 2) % 2  # blinks at 1 Hz
+        key = (self.state % 4, caret)
+        if key not in self.cache:
+            img = Image.new("RGB", self.SIZE, "#1e1e1e")
+            d = ImageDraw.Draw(img)
+            for line in range(key[0]):  # "text" lines
+                d.rectangle((20, 20 + line * 28, 20 + 180 + line * 90, 34 + line * 28), fill="#d4d4d4")
+            if caret:
+                d.rectangle((12, 20, 13, 40), fill="#ffffff")
+            self.cache[key] = img
+        return self.cache[key]
+
+    @property
+    def visible(self) -> bool:
+        """True once the last action's effect has been drawn."""
+        self.capture()
+        return self.pending is None
+
+
+async def fixed_pipeline(screen, latencies):
+    misfires = 0
+    for (_, delay), latency in zip(STEPS, latencies):
+        screen.act(latency)
+        await asyncio.sleep(delay)
+        if not screen.visible: misfires += 1
+    return misfires
+
+
+async def event_pipeline(screen, latencies):
+    misfires = 0
+    for latency in latencies:
+        tracker = StabilityTracker(grid=(32, 6), pixel_delta=24, min_changed_cells=1)
+        tracker.observe(screen.capture())  # baseline
+        screen.act(latency)
+        if not await wait_until(lambda: tracker.observe(screen.capture()), TIMEOUT, POLL): misfires += 1
+    return misfires
+
+
+async def run(prompts: int):
+    rng = random.Random(7)
+    print(f"{'profile':<8} | {'fixed s/prompt':>14} | {'misfires':>8} | {'event s/prompt':>14} | {'misfires':>8}")
+    print("-" * 66)
+    for name, (lo, hi) in PROFILES.items():
+        totals = {"fixed": [0.0, 0], "event": [0.0, 0]}
+        for _ in range(prompts):
+            latencies = [rng.uniform(lo, hi) for _ in STEPS]
+            for label, pipeline in (("fixed", fixed_pipeline), ("event", event_pipeline)):
+                screen = FakeScreen()
+                t0 = time.monotonic()
+                misfires = await pipeline(screen, latencies)
+                totals[label][0] += time.monotonic() - t0
+                totals[label][1] += misfires
+                await asyncio.sleep(hi)  # let any late effect land before the next run
+        fixed, event = totals["fixed"], totals["event"]
+        print(f"{name:<8} | {fixed[0] / prompts:14.2f} | {fixed[1]:8d} | {event[0] / prompts:14.2f} | {event[1]:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed sleeps vs readiness waits")
+    parser.add_argument("--prompts", type=int, default=3)
+    asyncio.run(run(parser.parse_args().prompts))
+
+
+if __name__ == "__main__":
+    main()
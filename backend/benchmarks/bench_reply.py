@@ -0,0 +1,75 @@
+"""
+Reply capture benchmark: whole-panel copy vs incremental extraction.
+
+A stand-in export directory gets one answer appended per prompt while the
+conversation grows. For each prompt it compares the legacy capture (the
+whole text, as Ctrl+A / Ctrl+C returned it) with FileTailSource (new bytes
+only) and ClipboardSource (full copy diffed by fingerprint), and checks that
+both incremental sources return exactly the new answer.
+Run from the backend folder:  python benchmarks/bench_reply.py [--prompts N]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_reply import ClipboardSource, FileTailSource, ReplyExtractor
+
+WORDS = "the build passes now and the dev server listens on port 5173 with hot reload enabled".split()
+
+
+def answer(rng, n):
+    body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 400)))
+    return f"\n\n## Prompt {n}\n\nRefactor step {n}.\n\n## Answer {n}\n\n{body}\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whole-panel copy vs incremental reply capture")
+    parser.add_argument("--prompts", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export = Path(tmp) / "conversation.md"
+        export.write_text("# Antigravity conversation\n", encoding="utf-8")
+        history = export.read_text(encoding="utf-8")
+
+        file_source = ReplyExtractor([FileTailSource(tmp)])
+        clipboard = ReplyExtractor([ClipboardSource(lambda: history)])
+        totals = {"legacy": [0, 0.0], "file": [0, 0.0], "clipboard": [0, 0.0]}
+        print(f"{'prompt':>6} | {'legacy chars':>12} | {'file chars':>10} | {'clipboard chars':>15}")
+        print("-" * 54)
+        for n in range(1, args.prompts + 1):
+            file_source.mark()
+            clipboard.mark()
+            new = answer(rng, n)
+            with open(export, "a", encoding="utf-8") as f:
+                f.write(new)
+            history += new
+
+            t0 = time.perf_counter()
+            legacy = export.read_text(encoding="utf-8")  # what the clipboard held
+            totals["legacy"][1] += time.perf_counter() - t0
+            results = {"legacy": legacy}
+            for label, extractor in (("file", file_source), ("clipboard", clipboard)):
+                t0 = time.perf_counter()
+                results[label] = extractor.read()
+                totals[label][1] += time.perf_counter() - t0
+            for label, text in results.items():
+                totals[label][0] += len(text)
+            if n > 1:  # the first clipboard capture has no fingerprint yet
+                assert results["file"] == new.strip() == results["clipboard"], f"prompt {n}: wrong diff"
+            if n in (1, 10, 50, args.prompts):
+                print(f"{n:6d} | {len(results['legacy']):12,d} | {len(results['file']):10,d} | {len(results['clipboard']):15,d}")
+
+        print()
+        for label, (chars, seconds) in totals.items():
+            print(f"{label:<9}: {chars / args.prompts:10,.0f} chars/prompt, {seconds / args.prompts * 1e6:8.1f} us/prompt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Stability check benchmark: full-frame ImageChops diff vs grayscale signatures.
+
+Feeds an "idle" IDE whose only activity is a blinking cursor and a taskbar
+clock, and reports per-frame cost and whether each method ever settles.
+Run from the backend folder:  python benchmarks/bench_stability.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_vision import StabilityTracker, parse_regions
+
+SIZES = [(1920, 1080), (3840, 2160)]
+FRAMES = 30
+
+
+def idle_frames(size, count):
+    """Frames that differ only by cursor blink and the clock text."""
+    width, height = size
+    base = Image.new("RGB", size, "#1e1e1e")
+    d = ImageDraw.Draw(base)
+    for i in range(40, height - 80, 24):
+        d.line((60, i, 60 + (i * 37) % (width // 2), i), fill="#9cdcfe", width=2)
+    d.rectangle((0, height - 48, width, height), fill="#202020")  # taskbar
+    frames = []
+    for n in range(count):
+        f = base.copy()
+        fd = ImageDraw.Draw(f)
+        if n % 2:
+            fd.rectangle((700, 400, 702, 420), fill="#ffffff")  # cursor
+        fd.text((width - 80, height - 32), f"10:{n:02d}", fill="#ffffff")  # clock
+        frames.append(f)
+    return frames
+
+
+def legacy_run(frames):
+    last = frames[0]
+    unchanged = 0
+    for f in frames[1:]:
+        if ImageChops.difference(last, f).getbbox(): unchanged, last = 0, f
+        else: unchanged += 1
+    return unchanged
+
+
+def tracker_run(frames):
+    tracker = StabilityTracker(ignore=parse_regions("0,0.95,1,1"))
+    unchanged = 0
+    for f in frames:
+        unchanged = 0 if tracker.observe(f) else unchanged + 1
+    return unchanged
+
+
+def main():
+    for size in SIZES:
+        frames = idle_frames(size, FRAMES)
+        t0 = time.perf_counter()
+        legacy_settled = legacy_run(frames)
+        legacy_ms = (time.perf_counter() - t0) / FRAMES * 1000
+
+        t0 = time.perf_counter()
+        tracker_settled = tracker_run(frames)
+        tracker_ms = (time.perf_counter() - t0) / FRAMES * 1000
+
+        tracker = StabilityTracker()
+        a, b = tracker.signature(frames[0]), tracker.signature(frames[1])
+        t0 = time.perf_counter()
+        for _ in range(10000):
+            tracker.changed_cells(a, b)
+        compare_us = (time.perf_counter() - t0) / 10000 * 1e6
+
+        print(f"{size[0]}x{size[1]}")
+        print(f"  ImageChops diff : {legacy_ms:7.2f} ms/frame, unchanged streak {legacy_settled}/{FRAMES - 1}")
+        print(f"  signatures      : {tracker_ms:7.2f} ms/frame, unchanged streak {tracker_settled}/{FRAMES - 1}")
+        print(f"  signature compare only: {compare_us:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Offline micro-benchmark suite for the per-cycle hot paths of ghostsync_core.
+
+Runs headless: frames are synthetic, capture and input go through a fake
+backend, and Telegram updates are stand-ins. Every case reports mean and
+p95 latency plus memory allocated per operation (tracemalloc peak; PIL pixel
+buffers live outside the traced allocator), and the run is saved as JSON so
+later runs can be compared against it.
+Run from the backend folder:
+    python benchmarks/bench_suite.py [--rounds N] [--out FILE] [--compare OLD.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import ghostsync_core as core
+from bench_detector import make_frame
+from bench_stability import idle_frames
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+FRAME_SIZE = (1920, 1080)
+MEMORY_ROUNDS = 20
+REGRESSION_PCT = 10.0
+
+# ==============================================================================
+# FAKE BACKENDS
+# ==============================================================================
+class FakeInput:
+    """pyautogui + pyperclip stand-in: screenshots cycle through frames, input is a no-op."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+        self.clipboard = ""
+
+    def screenshot(self):
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return frame
+
+    def click(self, *args, **kwargs): pass
+    def hotkey(self, *keys): pass
+    def press(self, key): pass
+    def copy(self, text): self.clipboard = text
+    def paste(self): return self.clipboard
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, text=""):
+        self.text = text
+        self.message_id = next(self._ids)
+
+    async def reply_text(self, text, **kwargs):
+        return FakeMessage(text)
+
+    async def reply_photo(self, photo, caption=None, **kwargs):
+        return FakeMessage(caption or "")
+
+
+class FakeBot:
+    async def delete_message(self, chat_id, message_id):
+        return True
+
+
+def fake_update(user_id: int, text: str):
+    message = FakeMessage(text)
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=SimpleNamespace(id=user_id),
+                           message=message, effective_message=message)
+
+
+class FakeController:
+    """Skips the IDE entirely so routing is measured on its own."""
+
+    async def open_folder_async(self, path):
+        return True, "Opened", None
+
+    async def send_prompt_async(self, text, ask_user_callback, project_path=None):
+        return {"ai_reply": f"Done: {text}", "local_url": None, "tunnel_url": None, "screenshot": None}
+
+
+def install_fakes(frames) -> FakeInput:
+    core.import_dependencies(automation=False)
+    fake = FakeInput(frames)
+    core.pyautogui = core.pyperclip = fake
+    core.detector = core.AcceptDenyDetector()
+    # Records are queued like in production; the listener has no sinks
+    core.log_pipeline.install([], level=logging.INFO)
+    return fake
+
+# ==============================================================================
+# MEASUREMENT
+# ==============================================================================
+def summarize(samples: list, peaks: list) -> dict:
+    p95 = statistics.quantiles(samples, n=20)[18] if len(samples) > 1 else samples[0]
+    return {
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p95_us": p95 * 1e6,
+        "min_us": min(samples) * 1e6,
+        "mem_kib": statistics.fmean(peaks) / 1024,
+        "rounds": len(samples),
+    }
+
+
+def measure(op, rounds: int, inner: int = 1) -> dict:
+    """Time `rounds` batches of `inner` calls, then trace allocations per call."""
+    op()
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(inner):
+            op()
+        samples.append((time.perf_counter() - t0) / inner)
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(rounds, MEMORY_ROUNDS)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        op()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return summarize(samples, peaks)
+
+
+async def measure_async(op, rounds: int) -> dict:
+    """measure() for coroutine functions, run inside the event loop."""
+    await op()
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        await op()
+        samples.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(rounds, MEMORY_ROUNDS)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await op()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return summarize(samples, peaks)
+
+# ==============================================================================
+# CASES
+# ==============================================================================
+def frame_cases(rounds: int) -> dict:
+    idle = make_frame(FRAME_SIZE, with_buttons=False)
+    prompt = make_frame(FRAME_SIZE, with_buttons=True)
+    detector = core.AcceptDenyDetector()
+    warm = core.AcceptDenyDetector()
+    warm.detect_accept_deny_prompt(prompt)
+
+    controller = core.AntigravityController()  # hwnd None: grab_frame falls back to the fake screenshot
+    encoder = core.AdaptiveEncoder()
+    stability = core.StabilityTracker(ignore=core.ignore_regions())
+
+    return {
+        "detector.idle": measure(lambda: (detector.scanner.reset(), detector.detect_accept_deny_prompt(idle)), rounds),
+        "detector.prompt_cold": measure(lambda: (detector.scanner.reset(), detector.detect_accept_deny_prompt(prompt)), rounds),
+        "detector.prompt_cached": measure(lambda: warm.detect_accept_deny_prompt(prompt), rounds),
+        "stability.observe_frame": measure(lambda: controller._observe_frame(None, stability), rounds),
+        "encode.quality": measure(lambda: encoder.encode(prompt), max(5, rounds // 10)),
+        "encode.fast": measure(lambda: encoder.encode(prompt, "fast"), rounds),
+    }
+
+
+def cpu_cases(rounds: int) -> dict:
+    limiter = core.RateLimiter(limits={"prompt": (10, 60), "command": (60, 60)})
+    users = itertools.cycle(range(1000))
+    formatter = core.SanitizingFormatter(core.LOG_FORMAT)
+    plain = logging.LogRecord("GhostSync", logging.INFO, __file__, 0, "Step 4: Click chat input area (%d, %d)", (1440, 918), None)
+    secret = logging.LogRecord("GhostSync", logging.INFO, __file__, 0,
+                               "HTTP Request: POST https://api.telegram.org/bot123:ABC-def/getUpdates", None, None)
+    return {
+        "rate_limiter.is_allowed": measure(lambda: limiter.is_allowed(next(users), "command"), rounds, inner=100),
+        "log_format.plain": measure(lambda: formatter.format(plain), rounds, inner=100),
+        "log_format.sensitive": measure(lambda: formatter.format(secret), rounds, inner=100),
+    }
+
+
+def routing_cases(rounds: int) -> dict:
+    core.controller = FakeController()
+    core.rate_limiter = core.RateLimiter(limits={"prompt": (10 ** 9, 1), "open": (10 ** 9, 1)})
+    context = SimpleNamespace(bot=FakeBot(), args=[])
+    user_id = 4242
+
+    async def confirm():
+        core.set_user_state(user_id, core.UserState.WAITING_FOR_CONFIRMATION, "C:/project")
+        await core.handle_message(fake_update(user_id, "yes"), context)
+
+    async def prompt():
+        core.set_user_state(user_id, core.UserState.READY_FOR_PROMPTS, "C:/project")
+        await core.handle_message(fake_update(user_id, "add a login page"), context)
+
+    async def run():
+        return {
+            "handle_message.confirm": await measure_async(confirm, rounds),
+            "handle_message.prompt": await measure_async(prompt, rounds),
+        }
+    return asyncio.run(run())
+
+# ==============================================================================
+# REPORT
+# ==============================================================================
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_table(results: dict, baseline: dict = None):
+    header = f"{'case':<26} {'mean us':>10} {'p95 us':>10} {'mem KiB':>9}"
+    if baseline: header += f" {'mean vs base':>13} {'p95 vs base':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        line = f"{name:<26} {r['mean_us']:10.1f} {r['p95_us']:10.1f} {r['mem_kib']:9.1f}"
+        old = (baseline or {}).get(name)
+        if old:
+            deltas = [(r[k] - old[k]) / old[k] * 100 if old[k] else 0.0 for k in ("mean_us", "p95_us")]
+            flag = "  !" if max(deltas) > REGRESSION_PCT else ""
+            line += f" {deltas[0]:+12.1f}% {deltas[1]:+11.1f}%{flag}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for GhostSync hot paths")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--out", type=Path, help="JSON output (default: benchmarks/results/suite-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier JSON result to diff against")
+    args = parser.parse_args()
+
+    install_fakes(idle_frames(FRAME_SIZE, 8))
+    results = {}
+    results.update(frame_cases(args.rounds))
+    results.update(cpu_cases(args.rounds))
+    results.update(routing_cases(args.rounds))
+
+    baseline = json.loads(args.compare.read_text())["results"] if args.compare else None
+    print_table(results, baseline)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "frame": list(FRAME_SIZE),
+        "results": results,
+    }
+    out = args.out or RESULTS_DIR / f"suite-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved {out}")
+    core.log_pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Transport benchmark: update-to-handler latency, polling vs webhook.
+
+A local stand-in Bot API (getMe, getUpdates long polling, setWebhook /
+deleteWebhook, sendMessage) feeds a real telegram Application built by
+ghostsync_core.application_builder. Updates are injected in bursts; each
+handler replies (one more Bot API call through the connection pool) after a
+short simulated upload. In webhook mode the stand-in POSTs every update to
+the local listener, like Telegram does. The last section checks pending-
+update replay: messages sent "while the bridge was down" are dropped or
+delivered depending on REPLAY_PENDING_SECONDS.
+Webhook mode needs python-telegram-bot[webhooks] (tornado).
+Run from the backend folder:  python benchmarks/bench_transport.py [--updates N]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import ghostsync_core as core
+
+TOKEN = "123456:stand-in"
+CHAT = {"id": 42, "type": "private", "first_name": "Bench"}
+USER = {"id": 42, "is_bot": False, "first_name": "Bench"}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# ==============================================================================
+# STAND-IN BOT API
+# ==============================================================================
+class StandInBotAPI:
+    """Just enough of api.telegram.org for an Application to poll, reply and use a webhook."""
+
+    def __init__(self):
+        self.updates = []          # pending (not yet confirmed by getUpdates offset)
+        self.next_id = 1
+        self.webhook = None        # (url, secret)
+        self.sent = 0
+        self.cond = threading.Condition()
+        self.httpd = None
+        self.port = None
+
+    # ---- injection ----
+    def inject(self, text: str, date: float = None) -> int:
+        with self.cond:
+            update_id, self.next_id = self.next_id, self.next_id + 1
+            update = {"update_id": update_id, "message": {
+                "message_id": update_id, "date": int(date or time.time()),
+                "chat": CHAT, "from": USER, "text": text}}
+            webhook = self.webhook
+            if webhook is None:
+                self.updates.append(update)
+                self.cond.notify_all()
+        if webhook:
+            threading.Thread(target=self._deliver, args=(webhook, update), daemon=True).start()
+        return update_id
+
+    def _deliver(self, webhook, update):
+        url, secret = webhook
+        req = urllib.request.Request(url, json.dumps(update).encode(), method="POST",
+                                     headers={"Content-Type": "application/json",
+                                              "X-Telegram-Bot-Api-Secret-Token": secret or ""})
+        urllib.request.urlopen(req, timeout=10).read()
+
+    # ---- methods ----
+    def call(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Stand-in", "username": "standin_bot"}
+        if method in ("deleteWebhook", "setWebhook"):
+            with self.cond:
+                if params.get("drop_pending_updates"): self.updates.clear()
+                self.webhook = (params["url"], params.get("secret_token")) if method == "setWebhook" else None
+                pending, self.updates = (self.updates, []) if self.webhook else ([], self.updates)
+            for update in pending:
+                self._deliver(self.webhook, update)
+            return True
+        if method == "getUpdates":
+            offset, timeout = int(params.get("offset") or 0), float(params.get("timeout") or 0)
+            deadline = time.monotonic() + timeout
+            with self.cond:
+                self.updates = [u for u in self.updates if u["update_id"] >= offset]
+                while not self.updates and time.monotonic() < deadline:
+                    self.cond.wait(deadline - time.monotonic())
+                return list(self.updates)
+        if method == "sendMessage":
+            self.sent += 1
+            return {"message_id": 10_000 + self.sent, "date": int(time.time()), "chat": CHAT,
+                    "text": params.get("text", "")}
+        if method in ("close", "logOut", "getWebhookInfo"):
+            return True
+        raise KeyError(method)
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                method = self.path.rsplit("/", 1)[-1]
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    params = json.loads(raw or "{}")
+                else:
+                    params = {k: self._value(v[0]) for k, v in parse_qs(raw).items()}
+                try:
+                    body = {"ok": True, "result": api.call(method, params)}
+                except KeyError:
+                    body = {"ok": False, "error_code": 404, "description": f"Not Found: {method}"}
+                data = json.dumps(body).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client stopped while a long poll was pending
+
+            @staticmethod
+            def _value(v):
+                try:
+                    return json.loads(v)
+                except ValueError:
+                    return v
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# ==============================================================================
+# SCENARIOS
+# ==============================================================================
+async def serve(settings: dict, scenario):
+    """Start an Application against a fresh stand-in with `settings`, run `scenario(api, received)`."""
+    api = StandInBotAPI()
+    api.start()
+    core.SETTINGS.update({k: v for k, v in settings.items() if k in core.SETTINGS})
+    if core.SETTINGS["TRANSPORT"] == "webhook":
+        core.SETTINGS["WEBHOOK_PORT"] = free_port()
+        core.SETTINGS["WEBHOOK_URL"] = f"http://127.0.0.1:{core.SETTINGS['WEBHOOK_PORT']}"
+    received = {}  # text -> perf_counter at handler start
+
+    async def on_text(update, context):
+        received[update.message.text] = time.perf_counter()
+        await asyncio.sleep(settings.get("work", 0.0))  # stand-in for encoding / uploading a screenshot
+        await update.message.reply_text("ok")
+
+    app = core.application_builder(TOKEN, base_url=f"http://127.0.0.1:{api.port}/bot").build()
+    app.add_handler(core.TypeHandler(core.Update, core.drop_stale_updates), group=-1)
+    app.add_handler(core.MessageHandler(core.filters.TEXT, on_text))
+    mode, options = core.transport_options()
+    try:
+        result = await scenario(api, received, app, mode, options)
+    finally:
+        if app.updater.running: await app.updater.stop()
+        if app.running: await app.stop()
+        await app.shutdown()
+        api.stop()
+    return mode, result
+
+
+async def start(app, mode, options):
+    await app.initialize()
+    if mode == "webhook":
+        await app.updater.start_webhook(**options)
+    else:
+        await app.updater.start_polling(**options)
+    await app.start()
+
+
+def burst(n: int, spacing: float):
+    async def scenario(api, received, app, mode, options):
+        await start(app, mode, options)
+        injected = {}
+        t0 = time.perf_counter()
+        for i in range(n):
+            text = f"prompt {i}"
+            injected[text] = time.perf_counter()
+            await asyncio.to_thread(api.inject, text)
+            await asyncio.sleep(spacing)
+        while len(received) < n and time.perf_counter() - t0 < 60:
+            await asyncio.sleep(0.01)
+        while api.sent < len(received) and time.perf_counter() - t0 < 60:
+            await asyncio.sleep(0.01)
+        lat = sorted((received[t] - injected[t]) * 1000 for t in received)
+        return {"n": len(lat), "mean": sum(lat) / len(lat), "p95": lat[int(0.95 * (len(lat) - 1))],
+                "wall": time.perf_counter() - t0}
+    return scenario
+
+
+async def replay_scenario(api, received, app, mode, options):
+    now = time.time()
+    core.started_at = now
+    for age in (5, 30, 600):  # sent while the bridge was down
+        api.inject(f"pending {age}s", date=now - age)
+    await start(app, mode, options)
+    await asyncio.sleep(1.0)
+    return sorted(received)
+
+
+async def run(n: int, spacing: float, work: float):
+    webhook_ok = importlib.util.find_spec("tornado") is not None
+    cases = [("polling, sequential", {"TRANSPORT": "polling", "CONCURRENT_UPDATES": 0}),
+             ("polling, concurrent 16", {"TRANSPORT": "polling", "CONCURRENT_UPDATES": 16}),
+             ("webhook, concurrent 16", {"TRANSPORT": "webhook", "CONCURRENT_UPDATES": 16})]
+    print(f"{n} updates, {spacing * 1000:.0f} ms apart, handler work {work * 1000:.0f} ms")
+    print(f"{'case':<24} | {'mean ms':>8} | {'p95 ms':>8} | {'wall s':>7}")
+    print("-" * 57)
+    for label, settings in cases:
+        if settings["TRANSPORT"] == "webhook" and not webhook_ok:
+            print(f"{label:<24} | skipped: pip install \"python-telegram-bot[webhooks]\"")
+            continue
+        mode, r = await serve(dict(settings, work=work, POLLING_TIMEOUT=10), burst(n, spacing))
+        assert mode == settings["TRANSPORT"], f"fell back to {mode}"
+        print(f"{label:<24} | {r['mean']:8.1f} | {r['p95']:8.1f} | {r['wall']:7.2f}")
+
+    print("\npending updates (5 s, 30 s, 600 s old) at startup:")
+    for replay in (0, 60):
+        _, got = await serve({"TRANSPORT": "polling", "REPLAY_PENDING_SECONDS": replay}, replay_scenario)
+        print(f"  REPLAY_PENDING_SECONDS={replay:<3} -> delivered {got or 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update-to-handler latency, polling vs webhook")
+    parser.add_argument("--updates", type=int, default=40)
+    parser.add_argument("--spacing", type=float, default=0.02, help="seconds between injected updates")
+    parser.add_argument("--work", type=float, default=0.2, help="simulated handler seconds")
+    args = parser.parse_args()
+    core.import_dependencies(automation=False)
+    asyncio.run(run(args.updates, args.spacing, args.work))
+
+
+if __name__ == "__main__":
+    main()
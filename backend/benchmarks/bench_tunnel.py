@@ -0,0 +1,63 @@
+"""
+Tunnel pool / supervisor benchmark against the cloudflared stand-in.
+
+Measures URL discovery, warm reuse, crash recovery and the no-URL timeout
+without touching the network. Runs on Linux or Windows:
+    python benchmarks/bench_tunnel.py
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+from ghostsync_tunnel import SecureTunnel
+
+FAKE = [sys.executable, str(HERE / "fake_cloudflared.py")]
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:<34} {(time.perf_counter() - start) * 1000:8.1f} ms  -> {result}")
+    return result
+
+
+def main():
+    os.environ.update(FAKE_CF_URL_DELAY="0.5", FAKE_CF_CHATTER="200")
+    pool = SecureTunnel(executable=FAKE, url_timeout=5, idle_timeout=60)
+
+    print("discovery / reuse")
+    first = timed("cold create (port 3000)", lambda: pool.create_tunnel(3000))
+    again = timed("warm reuse (port 3000)", lambda: pool.create_tunnel(3000))
+    timed("second port (5173)", lambda: pool.create_tunnel(5173))
+    assert first == again, "pooled URL changed"
+
+    # Chatty output for a while: the reader must keep draining the pipe
+    time.sleep(2)
+    sup = pool.processes[3000]["supervisor"]
+    print(f"  events buffered for 3000: {len(sup.events)} (bounded), alive={sup.running}")
+
+    print("crash recovery")
+    os.environ["FAKE_CF_CRASH_AFTER"] = "1"
+    pool.close(3000)
+    timed("create crashing tunnel", lambda: pool.create_tunnel(3000))
+    os.environ.pop("FAKE_CF_CRASH_AFTER")  # restarts come up healthy
+    time.sleep(3.5)
+    sup = pool.processes[3000]["supervisor"]
+    timed(f"reuse after {sup.restarts} restart(s)", lambda: pool.create_tunnel(3000))
+
+    print("timeout")
+    os.environ["FAKE_CF_NO_URL"] = "1"
+    pool.url_timeout = 1.5
+    timed("no URL (expect None after 1.5s)", lambda: pool.create_tunnel(8080))
+    os.environ.pop("FAKE_CF_NO_URL")
+
+    print("tunnels:", [(t["port"], t["restarts"]) for t in pool.list_tunnels()])
+    pool.kill_all()
+
+
+if __name__ == "__main__":
+    main()
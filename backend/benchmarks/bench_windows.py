@@ -0,0 +1,124 @@
+"""
+Window tracking benchmark: enumeration polling vs the event-fed registry.
+
+A fake desktop holds N top-level windows. Opening a project launches a window
+that appears after a random delay (and is renamed to the project title a bit
+later); the legacy path sleeps 5 s, the polling path re-enumerates every
+0.25 s, the event path waits on WindowRegistry driven by FakeEventSource.
+Lookups compare a full enumeration per call with a registry hit.
+Run from the backend folder:  python benchmarks/bench_windows.py [--opens N] [--windows N]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ghostsync_sessions import SessionManager
+from ghostsync_windows import FakeEventSource, WindowRegistry
+
+LEGACY_SLEEP = 5.0
+POLL = 0.25
+is_antigravity = lambda title: "Antigravity" in title
+
+
+class FakeDesktop:
+    """Top-level windows; enumerate() walks all of them like EnumWindows."""
+
+    def __init__(self, n: int, source: FakeEventSource):
+        self.titles = {1000 + i: f"Window {i}" for i in range(n)}
+        self.titles[1] = "old-project - Antigravity"
+        self.source = source
+        self.next_hwnd = 5000
+
+    def enumerate(self) -> list:
+        return [(hwnd, title) for hwnd, title in self.titles.items() if is_antigravity(title)]
+
+    def launch(self, loop, delay: float, project: str) -> int:
+        hwnd, self.next_hwnd = self.next_hwnd, self.next_hwnd + 1
+        def appear():
+            self.titles[hwnd] = "Antigravity"
+            self.source.create(hwnd, "Antigravity")
+        def rename():
+            self.titles[hwnd] = f"{project} - Antigravity"
+            self.source.rename(hwnd, self.titles[hwnd])
+        loop.call_later(delay, appear)
+        loop.call_later(delay + 0.5, rename)
+        return hwnd
+
+
+def new_window(sessions: SessionManager, before: set):
+    fresh = [h for h, _ in sessions.unclaimed(refresh=True) if h not in before]
+    return fresh[0] if fresh else None
+
+
+async def open_polling(desktop, sessions, before):
+    while True:
+        hwnd = new_window(sessions, before)
+        if hwnd: return hwnd
+        await asyncio.sleep(POLL)
+
+
+async def run(opens: int, n_windows: int):
+    rng = random.Random(11)
+    loop = asyncio.get_running_loop()
+    lags = {"legacy": [], "polling": [], "events": []}
+    for i in range(opens):
+        delay = rng.uniform(0.3, 2.0)
+        for label in ("polling", "events"):
+            registry = WindowRegistry(is_antigravity)
+            source = FakeEventSource(registry)
+            desktop = FakeDesktop(n_windows, source)
+            source.initial = desktop.enumerate()
+            source.start()
+            if label == "polling":
+                sessions = SessionManager(desktop.enumerate, lambda h: h in desktop.titles)
+            else:
+                sessions = SessionManager(registry.list, registry.__contains__, cache_ttl=0.0)
+            before = {h for h, _ in sessions.windows(True)}
+            t0 = time.monotonic()
+            expected = desktop.launch(loop, delay, f"project{i}")
+            if label == "polling":
+                hwnd = await open_polling(desktop, sessions, before)
+            else:
+                hwnd = await registry.wait_for(lambda: new_window(sessions, before), 15.0)
+            assert hwnd == expected, f"{label}: got {hwnd}"
+            lags[label].append(time.monotonic() - t0 - delay)
+            await asyncio.sleep(0.6)  # let the rename land
+        lags["legacy"].append(max(LEGACY_SLEEP - delay, 0.0))
+
+    print(f"open ({opens} launches, window appears after 0.3-2.0 s):")
+    for label, values in lags.items():
+        print(f"  {label:<8} returns {sum(values) / len(values) * 1000:7.1f} ms after the window appeared (max {max(values) * 1000:.1f})")
+
+    # Lookup cost: enumeration per call vs registry hit
+    registry = WindowRegistry(is_antigravity)
+    source = FakeEventSource(registry)
+    desktop = FakeDesktop(n_windows, source)
+    source.initial = desktop.enumerate()
+    source.start()
+    polled = SessionManager(desktop.enumerate, lambda h: h in desktop.titles, cache_ttl=0.0)
+    hooked = SessionManager(registry.list, registry.__contains__, cache_ttl=0.0)
+    print(f"\nlookup ({n_windows} top-level windows):")
+    for label, sessions in (("enumerate", polled), ("registry", hooked)):
+        rounds = 2000
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            sessions.find_window("old-project", refresh=True)
+        print(f"  {label:<9} {(time.perf_counter() - t0) / rounds * 1e6:8.1f} us per find_window")
+    print(f"  registry tracks {len(registry)} window(s) out of {n_windows + 1}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enumeration polling vs event-fed window registry")
+    parser.add_argument("--opens", type=int, default=5)
+    parser.add_argument("--windows", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args.opens, args.windows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Stand-in for cloudflared that prints the same kind of log lines.
+
+Usage mirrors the real binary:  fake_cloudflared.py tunnel --url http://localhost:3000
+Behaviour is tuned with environment variables:
+  FAKE_CF_URL_DELAY    seconds before the trycloudflare URL is printed (default 0.5)
+  FAKE_CF_NO_URL       if set, never print a URL
+  FAKE_CF_CRASH_AFTER  exit with code 1 after this many seconds
+  FAKE_CF_CHATTER      log lines per second after startup (default 20), to fill pipes
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+
+def log(level, msg):
+    print(f"{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())} {level} {msg}", flush=True)
+
+
+def main():
+    url_delay = float(os.environ.get("FAKE_CF_URL_DELAY", "0.5"))
+    crash_after = float(os.environ.get("FAKE_CF_CRASH_AFTER", "0") or 0)
+    chatter = float(os.environ.get("FAKE_CF_CHATTER", "20"))
+    target = sys.argv[sys.argv.index("--url") + 1] if "--url" in sys.argv else "http://localhost:8080"
+
+    start = time.time()
+    log("INF", "Thank you for trying Cloudflare Tunnel.")
+    log("INF", "Requesting new quick Tunnel on trycloudflare.com...")
+    time.sleep(url_delay)
+    if not os.environ.get("FAKE_CF_NO_URL"):
+        name = "-".join("".join(random.choices(string.ascii_lowercase, k=6)) for _ in range(3))
+        log("INF", "+--------------------------------------------------------------------------------------------+")
+        log("INF", "|  Your quick Tunnel has been created! Visit it at (it may take some time to be reachable):  |")
+        log("INF", f"|  https://{name}.trycloudflare.com                                                     |")
+        log("INF", "+--------------------------------------------------------------------------------------------+")
+    log("INF", f"Settings: map[ha-connections:1 protocol:quic url:{target}]")
+    n = 0
+    while True:
+        if crash_after and time.time() - start > crash_after:
+            log("ERR", "Connection terminated error=\"stand-in crash\"")
+            sys.exit(1)
+        n += 1
+        log("DBG" if n % 10 else "WRN", f"heartbeat {n} " + "x" * 200)
+        time.sleep(1 / chatter if chatter > 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
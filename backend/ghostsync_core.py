@@ -1,7 +1,13 @@
 """
 GhostSync v3.4 - SECURE Telegram to Antigravity Bridge (PROD)
+
+Importing this module is cheap and has no side effects: call init() (main()
+does) to read .env, start logging, import the GUI/Telegram dependencies and
+build the controller, detector and tunnel pool.
 """
 
+from __future__ import annotations
+
 import asyncio
 import ctypes
 import logging
@@ -13,17 +19,136 @@ import time
 import secrets
 import hashlib
 import threading
+import functools
+import itertools
+import inspect
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from enum import Enum
 from typing import Optional, Callable
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
 
+from ghostsync_logging import LogPipeline, SanitizingFormatter, sanitize
+from ghostsync_metrics import Metrics, MetricsServer
+from ghostsync_reply import ReplyExtractor
+from ghostsync_sessions import SessionManager, folder_name, normalize_path, title_names
+from ghostsync_store import StateStore
+from ghostsync_timing import AdaptivePoller, wait_until
+from ghostsync_tunnel import SecureTunnel, parse_ports
+from ghostsync_windows import WindowRegistry, WinEventSource, enum_windows
+
 # ==============================================================================
 # CONFIGURATION
 # ==============================================================================
 TELEGRAM_BOT_TOKEN = ""
 ALLOWED_USER_ID = 0
 
+# Tunables, overridable from .env (KEY=value). Values are coerced to the default's type.
+SETTINGS = {
+    # Stability check: frames are compared as 96x54 grayscale signatures
+    "STABILITY_PIXEL_DELTA": 12,          # grey levels a cell must move to count as changed
+    "STABILITY_MIN_CHANGED_CELLS": 2,     # changed cells needed to reset the stability timer
+    "STABILITY_WINDOW_SECONDS": 3.0,      # how long the screen must stay unchanged
+    "STABILITY_IGNORE_REGIONS": "",       # fractional l,t,r,b boxes of the frame, ';' separated (e.g. a status bar clock)
+    # Screenshots stay in memory; only written to disk (next to the app) when enabled
+    "SAVE_SCREENSHOTS_TO_DISK": False,
+    # Capture: "window" grabs only the Antigravity window, "desktop" the whole screen
+    "CAPTURE_MODE": "window",
+    "CAPTURE_REGION": "0,0,1,1",          # fractional l,t,r,b inside the window (e.g. chat panel)
+    # Wait loop cadence: fast after submit / while changing, backing off when idle
+    "POLL_MIN_INTERVAL": 0.25,
+    "POLL_MAX_INTERVAL": 2.0,
+    "POLL_BACKOFF": 1.5,                  # interval multiplier per idle frame
+    "POLL_FAST_SECONDS": 3.0,             # stay at the minimum interval this long after submit
+    "DETECT_MIN_INTERVAL": 0.5,           # Accept/Deny scan at most this often (after a change)
+    "DETECT_MAX_INTERVAL": 4.0,           # ...and at least this often
+    "WAIT_TIMEOUT_SECONDS": 180.0,
+    # Prompt entry: each step polls for its effect instead of sleeping a fixed time
+    "READY_POLL_INTERVAL": 0.05,
+    "READY_TIMEOUT_SECONDS": 3.0,         # focus / paste / submit must show within this
+    "CHAT_OPEN_TIMEOUT_SECONDS": 1.0,     # Ctrl+I may not change anything (chat already open)
+    "READY_PIXEL_DELTA": 24,              # above a blinking caret, below a line of text
+    "CHAT_INPUT_REGION": "0.5,0.78,1,0.92",  # fractional l,t,r,b of the chat input in the window
+    # Reply capture: only text new since the last prompt. Tails the newest matching file in
+    # REPLY_SOURCE_DIR (IDE log / conversation export) if set, else diffs the clipboard copy
+    "REPLY_SOURCE_DIR": "",
+    "REPLY_FILE_PATTERNS": "*.md;*.txt;*.log",
+    # /live: one Telegram photo edited in place while the IDE works
+    "LIVE_MAX_FPS": 0.5,                  # frame-rate cap (Bot API edits per second)
+    "LIVE_PIXEL_DELTA": 12,
+    "LIVE_MIN_CHANGED_CELLS": 8,          # skip frames closer than this to the last one sent
+    "LIVE_MAX_SIDE": 1280,                # downscale frames to this many pixels on the long side
+    "LIVE_IDLE_STOP_SECONDS": 300.0,      # auto-stop when no job runs and nothing changes
+    # Dev server discovery: candidate ports in priority order (ranges allowed)
+    "DEV_SERVER_PORTS": "3000-3002,5173,5174,8000,8080",
+    # GUI log panes: only the last N lines are kept (and searched) in memory
+    "LOG_VIEW_MAX_LINES": 2000,
+    # Prometheus-style text endpoint for the stage histograms (127.0.0.1 only; 0 disables)
+    "METRICS_PORT": 9464,
+    # Users, project windows and jobs survive restarts in this SQLite file
+    # (relative paths are under ~/.ghostsync, which outlives the onefile build's temp dir; "" disables)
+    "STATE_DB": "ghostsync_state.db",
+    # Telegram transport: "polling", or "webhook" (needs python-telegram-bot[webhooks] and WEBHOOK_URL)
+    "TRANSPORT": "polling",
+    "WEBHOOK_URL": "",                    # public https base URL forwarded to the local listener
+    "WEBHOOK_LISTEN": "127.0.0.1",
+    "WEBHOOK_PORT": 8443,
+    "WEBHOOK_PATH": "ghostsync",
+    "WEBHOOK_SECRET": "",                 # checked on every delivery; random per start when empty
+    "POLLING_TIMEOUT": 30,                # getUpdates long-poll seconds
+    # Bot API HTTP client: pool shared by replies / photo uploads, and per-request timeouts
+    "HTTP_POOL_SIZE": 16,
+    "HTTP_CONNECT_TIMEOUT": 5.0,
+    "HTTP_READ_TIMEOUT": 15.0,
+    "HTTP_WRITE_TIMEOUT": 30.0,           # screenshots are the largest uploads
+    "HTTP_POOL_TIMEOUT": 5.0,
+    "CONCURRENT_UPDATES": 16,             # updates handled in parallel (0 = one at a time)
+    # Messages sent while the bridge was down: replayed if at most this old, else dropped (0 = drop all)
+    "REPLAY_PENDING_SECONDS": 0.0,
+    # Outbound screenshots: encoded at Telegram's photo size; repeats re-sent by file_id
+    "PHOTO_MAX_SIDE": 1280,
+    "PHOTO_JPEG_QUALITY": 85,             # highest (starting) quality for the lossy formats
+    "ENCODE_FORMATS": "png8,jpeg",        # tried in order for results (png8, jpeg, webp)
+    "ENCODE_BYTE_BUDGET": 350000,         # bytes per result screenshot
+    "ENCODE_TARGET_MS": 250.0,            # stop trying smaller encodings after this long
+    "LIVE_BYTE_BUDGET": 120000,           # /live frames (fast mode: one JPEG encode each)
+    "LIVE_TARGET_MS": 60.0,
+    "PHOTO_BEFORE_AFTER": False,          # prompt results as a two-photo album (prompt entered / result)
+}
+
+# Per-user config / state folder (the GUI writes its .env here too)
+CONFIG_DIR = Path(os.path.expanduser("~")) / ".ghostsync"
+
+# Per-project overrides live in <project>/.ghostsync.env (same KEY=value format)
+PROJECT_ENV_FILE = ".ghostsync.env"
+
+def _coerce_setting(key: str, val: str):
+    default = SETTINGS[key]
+    if isinstance(default, bool): return val.lower() in ("1", "true", "yes", "on")
+    return type(default)(val)
+
+def _read_env_file(env_path: Path) -> dict:
+    values = {}
+    try:
+        content = env_path.read_text(encoding='utf-8')
+        for line in content.splitlines():
+            if "=" in line and not line.strip().startswith("#"):
+                key, val = line.split("=", 1)
+                values[key.strip()] = val.strip().strip('"\'')
+    except Exception:
+        pass
+    return values
+
+def _apply_settings(values: dict, target: dict):
+    for key, val in values.items():
+        if key in SETTINGS:
+            try:
+                target[key] = _coerce_setting(key, val)
+            except ValueError:
+                pass
+
 def load_config():
     """Load configuration from .env file."""
     global TELEGRAM_BOT_TOKEN, ALLOWED_USER_ID
@@ -33,30 +158,34 @@ def load_config():
     
     # If not found, try user home directory (production mode)
     if not env_path.exists():
-        env_path = Path(os.path.expanduser("~")) / ".ghostsync" / ".env"
+        env_path = CONFIG_DIR / ".env"
     
     if env_path.exists():
-        try:
-            content = env_path.read_text(encoding='utf-8')
-            for line in content.splitlines():
-                if "=" in line and not line.strip().startswith("#"):
-                    key, val = line.split("=", 1)
-                    key, val = key.strip(), val.strip().strip('"\'')
-                    if key == "TELEGRAM_BOT_TOKEN":
-                        TELEGRAM_BOT_TOKEN = val
-                    elif key == "ALLOWED_USER_ID":
-                        try:
-                            ALLOWED_USER_ID = int(val)
-                        except ValueError:
-                            pass
-        except Exception as e:
-            pass
+        values = _read_env_file(env_path)
+        if "TELEGRAM_BOT_TOKEN" in values:
+            TELEGRAM_BOT_TOKEN = values["TELEGRAM_BOT_TOKEN"]
+        if "ALLOWED_USER_ID" in values:
+            try:
+                ALLOWED_USER_ID = int(values["ALLOWED_USER_ID"])
+            except ValueError:
+                pass
+        _apply_settings(values, SETTINGS)
 
-load_config()
+def project_settings(project_path: Optional[str]) -> dict:
+    """Global SETTINGS overlaid with the project's .ghostsync.env, if any."""
+    cfg = dict(SETTINGS)
+    if project_path:
+        env_path = Path(project_path) / PROJECT_ENV_FILE
+        if env_path.exists():
+            _apply_settings(_read_env_file(env_path), cfg)
+    return cfg
 
 # Security settings
 TUNNEL_TIMEOUT_MINUTES = 30
-MAX_REQUESTS_PER_MINUTE = 10
+OPEN_WINDOW_TIMEOUT = 15.0            # seconds for a launched project window to appear
+MAX_REQUESTS_PER_MINUTE = 10          # prompts (expensive: drive the IDE)
+MAX_OPENS_PER_MINUTE = 20             # project opens
+MAX_COMMANDS_PER_MINUTE = 60          # cheap status commands (/queue, /status, ...)
 SCREENSHOT_AUTO_DELETE = True
 
 # ==============================================================================
@@ -64,72 +193,146 @@ SCREENSHOT_AUTO_DELETE = True
 # ==============================================================================
 log_path = Path(__file__).parent / "ghostsync.log"
 
-class SanitizingFormatter(logging.Formatter):
-    SENSITIVE_PATTERNS = [
-        (r'token=[\w-]+', 'token=***'),
-        (r'password["\']?\s*[:=]\s*["\']?[\w]+', 'password=***'),
-        (r'api[_-]?key["\']?\s*[:=]\s*["\']?[\w]+', 'api_key=***'),
-    ]
-    def format(self, record):
-        msg = super().format(record)
-        for pattern, replacement in self.SENSITIVE_PATTERNS:
-            msg = re.sub(pattern, replacement, msg, flags=re.IGNORECASE)
-        return msg
-
-handler = logging.FileHandler(log_path, encoding='utf-8')
-handler.setFormatter(SanitizingFormatter('%(asctime)s | %(levelname)-7s | %(message)s'))
-
-logging.basicConfig(
-    format='%(asctime)s | %(levelname)-7s | %(message)s',
-    level=logging.INFO,
-    handlers=[handler, logging.StreamHandler()]
-)
+LOG_FORMAT = '%(asctime)s | %(levelname)-7s | %(message)s'
+
+# Records are queued by the caller; redaction + file/console/GUI I/O run on the
+# pipeline's listener thread (GUI panes register with log_pipeline.add_sink,
+# which works before init() too)
+log_pipeline = LogPipeline()
 log = logging.getLogger("GhostSync")
 
+def setup_logging():
+    """Install the pipeline once (the GUI calls this before it logs, init() again later)."""
+    if log_pipeline.installed: return
+    handler = logging.FileHandler(log_path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_pipeline.install([handler, console], level=logging.INFO)
+
 # ==============================================================================
-# DEPENDENCIES
+# METRICS
 # ==============================================================================
-try:
-    import pyautogui
-    import pygetwindow as gw
-    import pyperclip
-    from PIL import ImageChops, Image
-    from telegram import Update
-    from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
-except ImportError as e:
-    log.error(f"Critical Import Error: {e}")
-    if getattr(sys, 'frozen', False):
-        sys.exit(1)
+# Wall time of every prompt pipeline stage (spans), read by /stats and METRICS_PORT
+metrics = Metrics()
+metrics_server: Optional[MetricsServer] = None
 
-pyautogui.FAILSAFE = True
-pyautogui.PAUSE = 0.05
+# ==============================================================================
+# DEPENDENCIES (loaded by init, not at import)
+# ==============================================================================
+pyautogui = pyperclip = Image = None
+Update = ContextTypes = InputMediaPhoto = InlineKeyboardButton = InlineKeyboardMarkup = None
+BadRequest = RetryAfter = TelegramError = None
+ApplicationBuilder = CommandHandler = CallbackQueryHandler = MessageHandler = TypeHandler = filters = None
+ApplicationHandlerStop = None
+ButtonScanner = StabilityTracker = parse_regions = sub_box = translate_hit = None
+AdaptiveEncoder = MediaSender = FORMAT_EXT = None
+
+def import_dependencies(automation: bool = True):
+    """
+    Import the heavy modules (pyautogui, PIL, NumPy, telegram) into this namespace.
+
+    automation=False skips the input backends (pyautogui, pyperclip), for
+    headless tooling that installs its own fakes.
+    """
+    global pyautogui, pyperclip, Image
+    global Update, ContextTypes, InputMediaPhoto, InlineKeyboardButton, InlineKeyboardMarkup
+    global BadRequest, RetryAfter, TelegramError
+    global ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler, TypeHandler, filters
+    global ApplicationHandlerStop
+    global ButtonScanner, StabilityTracker, parse_regions, sub_box, translate_hit
+    global AdaptiveEncoder, MediaSender, FORMAT_EXT
+    try:
+        if automation:
+            import pyautogui
+            import pyperclip
+        from PIL import Image
+        from telegram import Update, InputMediaPhoto, InlineKeyboardButton, InlineKeyboardMarkup
+        from telegram.error import BadRequest, RetryAfter, TelegramError
+        from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+        from telegram.ext import ApplicationHandlerStop, TypeHandler
+        from ghostsync_vision import ButtonScanner, StabilityTracker, parse_regions, sub_box, translate_hit
+        from ghostsync_media import AdaptiveEncoder, MediaSender, FORMAT_EXT
+    except ImportError as e:
+        log.error(f"Critical Import Error: {e}")
+        if getattr(sys, 'frozen', False):
+            sys.exit(1)
+        raise
+
+    if automation:
+        pyautogui.FAILSAFE = True
+        pyautogui.PAUSE = 0.05
 
 # ==============================================================================
 # RATE LIMITER
 # ==============================================================================
 class RateLimiter:
-    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
-        self.max_requests = max_requests
-        self.window = window_seconds
-        self.requests = {}
-
-    def is_allowed(self, user_id: int) -> bool:
-        now = time.time()
-        if user_id not in self.requests:
-            self.requests[user_id] = []
-        self.requests[user_id] = [t for t in self.requests[user_id] if now - t < self.window]
-        if len(self.requests[user_id]) >= self.max_requests:
+    """
+    Token buckets per (user, kind), O(1) per admission.
+
+    Each kind ("prompt", "open", "command") has its own capacity of
+    `max_requests` per `window_seconds`, refilled continuously. Buckets live
+    in LRU order; any bucket idle long enough to be full again is dropped
+    (it is indistinguishable from a new one), and at most `max_buckets` are
+    kept, so open mode can't grow memory without bound.
+    """
+
+    def __init__(self, max_requests: int = 10, window_seconds: int = 60,
+                 limits: Optional[dict] = None, max_buckets: int = 10000):
+        # kind -> (capacity, refill tokens per second)
+        self.limits = {kind: (float(n), n / float(w))
+                       for kind, (n, w) in (limits or {"prompt": (max_requests, window_seconds)}).items()}
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()  # (user_id, kind) -> [tokens, last_refill]
+        self.allowed = Counter()
+        self.rejected = Counter()
+
+    def is_allowed(self, user_id: int, kind: str = "prompt") -> bool:
+        capacity, rate = self.limits.get(kind) or self.limits["prompt"]
+        now = time.monotonic()
+        self._evict(now)
+        key = (user_id, kind)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [capacity, now]
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self.buckets.move_to_end(key)
+
+        if bucket[0] < 1.0:
+            self.rejected[kind] += 1
             return False
-        self.requests[user_id].append(now)
+        bucket[0] -= 1.0
+        self.allowed[kind] += 1
         return True
+
+    def _evict(self, now: float):
+        while self.buckets:
+            (user_id, kind), (tokens, last) = next(iter(self.buckets.items()))
+            capacity, rate = self.limits.get(kind) or self.limits["prompt"]
+            refilled = tokens + (now - last) * rate >= capacity
+            if not refilled and len(self.buckets) < self.max_buckets: break
+            self.buckets.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Counters for monitoring: allowed / rejected per kind and live buckets."""
+        return {"allowed": dict(self.allowed), "rejected": dict(self.rejected), "buckets": len(self.buckets)}
     
-rate_limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE, 60)
+rate_limiter = RateLimiter(limits={
+    "prompt": (MAX_REQUESTS_PER_MINUTE, 60),
+    "open": (MAX_OPENS_PER_MINUTE, 60),
+    "command": (MAX_COMMANDS_PER_MINUTE, 60),
+})
 
 # ==============================================================================
 # WINDOWS API
 # ==============================================================================
-user32 = ctypes.windll.user32
+user32 = gdi32 = None  # bound by bind_windows_api() (ctypes.windll only exists on Windows)
 SW_RESTORE = 9
+SRCCOPY = 0x00CC0020
+CAPTUREBLT = 0x40000000
+SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 76, 77, 78, 79
 
 class RECT(ctypes.Structure):
     _fields_ = [("left", ctypes.c_long),
@@ -137,6 +340,19 @@ class RECT(ctypes.Structure):
                 ("right", ctypes.c_long),
                 ("bottom", ctypes.c_long)]
 
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [("biSize", ctypes.c_uint32), ("biWidth", ctypes.c_int32),
+                ("biHeight", ctypes.c_int32), ("biPlanes", ctypes.c_uint16),
+                ("biBitCount", ctypes.c_uint16), ("biCompression", ctypes.c_uint32),
+                ("biSizeImage", ctypes.c_uint32), ("biXPelsPerMeter", ctypes.c_int32),
+                ("biYPelsPerMeter", ctypes.c_int32), ("biClrUsed", ctypes.c_uint32),
+                ("biClrImportant", ctypes.c_uint32)]
+
+def bind_windows_api():
+    global user32, gdi32
+    user32 = ctypes.windll.user32
+    gdi32 = ctypes.windll.gdi32
+
 def get_foreground_hwnd() -> int:
     return user32.GetForegroundWindow()
 
@@ -149,6 +365,33 @@ def get_window_title(hwnd: int) -> str:
 def is_window_valid(hwnd: int) -> bool:
     return bool(user32.IsWindow(hwnd))
 
+def get_window_rect(hwnd: int) -> tuple:
+    rect = RECT()
+    user32.GetWindowRect(hwnd, ctypes.byref(rect))
+    return rect.left, rect.top, rect.right, rect.bottom
+
+def grab_screen_box(left: int, top: int, right: int, bottom: int) -> Image.Image:
+    """BitBlt only the given screen box (virtual-desktop coordinates) into a PIL image."""
+    width, height = right - left, bottom - top
+    screen_dc = user32.GetDC(0)
+    mem_dc = gdi32.CreateCompatibleDC(screen_dc)
+    bitmap = gdi32.CreateCompatibleBitmap(screen_dc, width, height)
+    try:
+        previous = gdi32.SelectObject(mem_dc, bitmap)
+        gdi32.BitBlt(mem_dc, 0, 0, width, height, screen_dc, left, top, SRCCOPY | CAPTUREBLT)
+        gdi32.SelectObject(mem_dc, previous)
+        header = BITMAPINFOHEADER()
+        header.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        header.biWidth, header.biHeight = width, -height  # negative = top-down rows
+        header.biPlanes, header.biBitCount = 1, 32
+        buf = ctypes.create_string_buffer(width * height * 4)
+        gdi32.GetDIBits(mem_dc, bitmap, 0, height, buf, ctypes.byref(header), 0)
+        return Image.frombytes("RGB", (width, height), buf.raw, "raw", "BGRX")
+    finally:
+        gdi32.DeleteObject(bitmap)
+        gdi32.DeleteDC(mem_dc)
+        user32.ReleaseDC(0, screen_dc)
+
 def focus_window_by_hwnd(hwnd: int) -> bool:
     if not is_window_valid(hwnd): return False
     try:
@@ -163,141 +406,128 @@ def focus_window_by_hwnd(hwnd: int) -> bool:
 # ==============================================================================
 # SECURE CLOUDFLARE TUNNEL
 # ==============================================================================
-class SecureTunnel:
-    CLOUDFLARED_PATH = Path(__file__).parent / "cloudflared.exe"
-    
-    def __init__(self):
-        self.processes = {}
-    
-    def ensure_cloudflared(self) -> bool:
-        if self.CLOUDFLARED_PATH.exists(): return True
-        log.info("Downloading cloudflared...")
-        try:
-            import urllib.request
-            url = "https://github.com/cloudflare/cloudflared/releases/latest/download/cloudflared-windows-amd64.exe"
-            urllib.request.urlretrieve(url, str(self.CLOUDFLARED_PATH))
-            return True
-        except Exception as e:
-            log.error(f"Download failed: {e}")
-            return False
-    
-    def create_tunnel(self, port: int) -> Optional[str]:
-        self.kill_all()
-        if not self.ensure_cloudflared(): return None
-        
-        try:
-            log.info(f"Creating tunnel for port {port}...")
-            proc = subprocess.Popen(
-                [str(self.CLOUDFLARED_PATH), "tunnel", "--url", f"http://localhost:{port}"],
-                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            
-            start_time = time.time()
-            found_url = None
-            while time.time() - start_time < 30:
-                line = proc.stdout.readline()
-                if not line:
-                    time.sleep(0.1)
-                    continue
-                match = re.search(r'https://[a-zA-Z0-9-]+\.trycloudflare\.com', line)
-                if match:
-                    found_url = match.group(0)
-                    break
-            
-            if found_url:
-                self.processes[port] = {"process": proc, "url": found_url, "created": datetime.now()}
-                return found_url
-            proc.terminate()
-            return None
-        except Exception as e:
-            log.error(f"Tunnel error: {e}")
-            return None
+# Warm pool: one cloudflared per port, reused until idle for TUNNEL_TIMEOUT_MINUTES (built by init)
+tunnel: Optional[SecureTunnel] = None
 
-    def is_port_open(self, port: int) -> bool:
-        import socket
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(0.5)
-                return s.connect_ex(('localhost', port)) == 0
-        except:
-            return False
+# ==============================================================================
+# SECURE SCREENSHOT HANDLING (in-memory)
+# ==============================================================================
+def capture_box(hwnd: Optional[int], cfg: Optional[dict] = None) -> Optional[tuple]:
+    """Screen box (l, t, r, b) to capture for hwnd; None means the whole desktop."""
+    cfg = cfg or SETTINGS
+    if cfg["CAPTURE_MODE"] != "window" or not hwnd or not is_window_valid(hwnd): return None
+    if user32.IsIconic(hwnd): return None
+    regions = parse_regions(cfg["CAPTURE_REGION"]) or [(0, 0, 1, 1)]
+    box = sub_box(get_window_rect(hwnd), regions[0])
+    # Clip to the virtual desktop (maximized windows overhang by a few pixels)
+    vx, vy = user32.GetSystemMetrics(SM_XVIRTUALSCREEN), user32.GetSystemMetrics(SM_YVIRTUALSCREEN)
+    vw, vh = user32.GetSystemMetrics(SM_CXVIRTUALSCREEN), user32.GetSystemMetrics(SM_CYVIRTUALSCREEN)
+    left, top = max(box[0], vx), max(box[1], vy)
+    right, bottom = min(box[2], vx + vw), min(box[3], vy + vh)
+    if right - left < 16 or bottom - top < 16: return None
+    return left, top, right, bottom
 
-    def detect_dev_server(self) -> Optional[int]:
-        common_ports = [3000, 3001, 3002, 5173, 5174, 8000, 8080]
-        try:
-            result = subprocess.run(["netstat", "-ano"], capture_output=True, text=True, shell=True)
-            for port in common_ports:
-                if f":{port}" in result.stdout and "LISTENING" in result.stdout:
-                    return port
-        except: pass
-        return None
+# Taskbar strip (clock), masked only when frames are the whole desktop
+DESKTOP_IGNORE_REGIONS = "0,0.95,1,1"
 
-    def kill_all(self):
-        for port in list(self.processes.keys()):
-            try:
-                self.processes[port]["process"].terminate()
-                del self.processes[port]
-            except: pass
+def ignore_regions(cfg: Optional[dict] = None) -> list:
+    """STABILITY_IGNORE_REGIONS, plus the taskbar strip in desktop capture mode."""
+    cfg = cfg or SETTINGS
+    spec = cfg["STABILITY_IGNORE_REGIONS"]
+    if cfg["CAPTURE_MODE"] != "window": spec = f"{spec};{DESKTOP_IGNORE_REGIONS}"
+    return parse_regions(spec)
 
-tunnel = SecureTunnel()
+def grab_frame(hwnd: Optional[int] = None, cfg: Optional[dict] = None) -> tuple:
+    """
+    Capture the Antigravity window (or CAPTURE_REGION of it) into memory.
 
-# ==============================================================================
-# SECURE FILE HANDLING
-# ==============================================================================
-def secure_delete(filepath: str):
-    try:
-        path = Path(filepath)
-        if path.exists():
-            path.unlink()
-    except: pass
-
-def take_screenshot_secure() -> str:
-    random_suffix = secrets.token_hex(4)
-    path = str(Path(__file__).parent / f"ss_{random_suffix}.png")
+    Returns (image, origin) where origin is the screen position of the
+    image's top-left pixel, used to translate detections back for clicks.
+    `cfg` is the project's settings (capture mode / region may be overridden).
+    """
+    box = capture_box(hwnd, cfg)
+    if box:
+        try:
+            return grab_screen_box(*box), (box[0], box[1])
+        except Exception as e:
+            log.warning(f"Window capture failed, falling back to desktop: {e}")
+    return pyautogui.screenshot(), (0, 0)
+
+def take_screenshot_secure(hwnd: Optional[int] = None, cfg: Optional[dict] = None) -> Optional[Image.Image]:
+    """Capture the screen into memory. Nothing touches the disk."""
     try:
-        pyautogui.screenshot().save(path)
-        return path
-    except: return ""
+        return grab_frame(hwnd, cfg)[0]
+    except: return None
+
+# Screenshot encoding (format / quality per frame, own threads) and outbound photos
+# with file_id reuse for repeated frames (built by init)
+encoder: Optional[AdaptiveEncoder] = None
+media: Optional[MediaSender] = None
+
+def save_screenshot_debug(image: Optional[Image.Image], name: str):
+    """Queue a screenshot to disk (on the encoder threads) only when SAVE_SCREENSHOTS_TO_DISK is enabled."""
+    if image is None or not SETTINGS["SAVE_SCREENSHOTS_TO_DISK"]: return
+    def write():
+        encoded = encoder.encode(image)
+        path = Path(__file__).parent / f"{name}_{secrets.token_hex(4)}.{FORMAT_EXT[encoded['format']]}"
+        try:
+            path.write_bytes(encoded["data"])
+        except OSError as e:
+            log.warning(f"Screenshot not saved: {e}")
+    encoder.executor.submit(write)
 
 # ==============================================================================
 # ANTIGRAVITY CONTROLLER
 # ==============================================================================
 class AcceptDenyDetector:
+    def __init__(self):
+        self.scanner = ButtonScanner()
+
     def detect_accept_deny_prompt(self, screenshot: Image.Image) -> Optional[dict]:
-        # Simple color-based detection for Green/Red buttons
-        width, height = screenshot.size
-        pixels = screenshot.load()
-        search_left = int(width * 0.5)
-        search_top = int(height * 0.2)
-        
-        green_pos = None
-        red_pos = None
-        
-        for y in range(search_top, height, 20):
-            for x in range(search_left, width, 20):
-                r, g, b = pixels[x, y][:3]
-                if g > 150 and g > r * 1.5 and g > b * 1.5: green_pos = (x, y)
-                if r > 150 and r > g * 1.5 and r > b * 1.5: red_pos = (x, y)
-                if green_pos and red_pos: break
-            if green_pos and red_pos: break
-            
-        if green_pos and red_pos:
-            return {"accept_pos": green_pos, "deny_pos": red_pos}
-        return None
+        # Color-based detection for Green/Red buttons (vectorized, last hit region first)
+        return self.scanner.scan(screenshot)
 
     def click_accept(self, pos): pyautogui.click(pos[0], pos[1])
     def click_deny(self, pos): pyautogui.click(pos[0], pos[1])
 
-detector = AcceptDenyDetector()
+detector: Optional[AcceptDenyDetector] = None
 
 class AntigravityController:
     ANTIGRAVITY_EXE = str(Path(os.path.expanduser("~")) / "AppData/Local/Programs/Antigravity/Antigravity.exe")
 
     def __init__(self):
-        self.hwnd = None
-        self.project_path = None
-        self.latest_stream_ss = None
+        # Antigravity windows, kept current by window events once track_windows() ran
+        self.windows = WindowRegistry(lambda title: "Antigravity" in title)
+        self.window_events = None
+        # project path -> Antigravity window (cached window enumeration until events are hooked)
+        self.sessions = SessionManager(self._list_antigravity_windows, is_window_valid)
+        # Every mouse / keyboard / capture call runs on this one thread, in order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="GhostSync-Automation")
+        self._desk_lock = None  # asyncio.Lock, created on the bot's loop
+        self.replies = {}  # (project path, reply dir) -> ReplyExtractor (keeps the last-capture fingerprint)
+
+    @property
+    def desk_lock(self) -> asyncio.Lock:
+        """
+        Held while a window is driven (input, wait loop, reply capture): they all
+        share one screen. Prompts for other projects queue on it in FIFO order.
+        """
+        if self._desk_lock is None: self._desk_lock = asyncio.Lock()
+        return self._desk_lock
+
+    def track_windows(self, source=None) -> bool:
+        """
+        Switch window lookups from EnumWindows polling to the event-fed
+        registry (dictionary hits). Without a working event source the
+        enumeration fallback stays in place.
+        """
+        source = source or WinEventSource(self.windows)
+        if not source.start(): return False
+        self.window_events = source
+        self.sessions.list_windows = self.windows.list
+        self.sessions.is_valid = self.windows.__contains__
+        self.sessions.cache_ttl = 0.0  # the registry is always current
+        return True
 
     async def cmd_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         log.info(f"Received /start from {update.effective_user.id}")
@@ -308,68 +538,191 @@ class AntigravityController:
         await update.message.reply_text("👻 **GhostSync Active**\nSend the **project folder path** to open Antigravity.")
 
     def open_folder(self, path: str):
+        """Blocking wrapper around open_folder_async (for callers without an event loop)."""
+        return asyncio.run(self.open_folder_async(path))
+
+    async def open_folder_async(self, path: str):
+        """Open (or re-attach to) the project's window and make it a session."""
         try:
-            subprocess.Popen([self.ANTIGRAVITY_EXE, path])
-            time.sleep(5)
-            hwnds = self._find_antigravity_windows()
-            if hwnds:
-                self.hwnd = hwnds[0]
-                self.project_path = path
-                ss_path = take_screenshot_secure()
-                return True, "Opened", ss_path
-            return False, "Window not found", None
+            async with self.desk_lock:
+                session = self.sessions.get(path)
+                if session and await self._gui(self.sessions.resolve, session):
+                    await self._gui(focus_window_by_hwnd, session.hwnd)
+                    self.sessions.register(path, session.hwnd)
+                    return True, "Already open", await self._gui(take_screenshot_secure, session.hwnd, project_settings(path))
+
+                # A window already showing this folder is adopted instead of launching another
+                hwnd = await self._gui(self.sessions.find_window, path, None, True)
+                if hwnd is None:
+                    before = {h for h, _ in await self._gui(self.sessions.windows, True)}
+                    await self._gui(subprocess.Popen, [self.ANTIGRAVITY_EXE, path])
+                    hwnd = await self._wait_new_window(path, before)
+                if hwnd:
+                    self.sessions.register(path, hwnd)
+                    return True, "Opened", await self._gui(take_screenshot_secure, hwnd, project_settings(path))
+                return False, "Window not found", None
         except Exception as e:
             return False, str(e), None
 
-    def _find_antigravity_windows(self):
-        hwnds = []
-        def enum_callback(hwnd, _):
-            if user32.IsWindowVisible(hwnd) and "Antigravity" in get_window_title(hwnd):
-                hwnds.append(hwnd)
-            return True
-        WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.c_int, ctypes.c_int)
-        user32.EnumWindows(WNDENUMPROC(enum_callback), 0)
-        return hwnds
-
-    def send_prompt(self, text, ask_user_callback):
-        log.info(f"--- STARTING GUARANTEED FOCUS SEQUENCE for: {text[:20]}... ---")
+    async def _wait_new_window(self, path: str, before: set) -> Optional[int]:
+        """Returns as soon as the launched window shows up (event-driven when hooked)."""
+        if self.window_events:
+            return await self.windows.wait_for(lambda: self._new_window(path, before), OPEN_WINDOW_TIMEOUT)
+        hwnd = None
+        async def appeared():
+            nonlocal hwnd
+            hwnd = await self._gui(self._new_window, path, before)
+            return hwnd
+        await wait_until(appeared, OPEN_WINDOW_TIMEOUT, 0.25)
+        return hwnd
+
+    def _new_window(self, path: str, before: set) -> Optional[int]:
+        """Window of a just-launched project: its title names the folder, else any new window."""
+        hwnd = self.sessions.find_window(path, refresh=True)
+        if hwnd: return hwnd
+        fresh = [h for h, _ in self.sessions.unclaimed() if h not in before]
+        return fresh[0] if fresh else None
+
+    async def _gui(self, fn, *args, **kwargs):
+        """Run a blocking GUI/automation call on the dedicated automation thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def _list_antigravity_windows(self):
+        return enum_windows(user32, self.windows.match)
+
+    def _bring_to_front(self, hwnd):
+        if user32.IsIconic(hwnd):
+            user32.ShowWindow(hwnd, SW_RESTORE)
+        user32.SetForegroundWindow(hwnd)
+
+    def _paste_text(self, text):
+        pyperclip.copy(text)
+        # Use Ctrl+V to paste (more reliable than typing for special characters)
+        pyautogui.hotkey('ctrl', 'v')
+
+    def _copy_reply(self, hwnd) -> Optional[str]:
+        if get_foreground_hwnd() != hwnd: self._bring_to_front(hwnd)
+        pyautogui.hotkey('ctrl', 'a')
+        pyautogui.hotkey('ctrl', 'c')
+        time.sleep(0.1)
+        return pyperclip.paste()
+
+    def _reply_extractor(self, session, cfg) -> ReplyExtractor:
+        key = (session.project_path, cfg["REPLY_SOURCE_DIR"])
+        if key not in self.replies:
+            self.replies[key] = ReplyExtractor.from_settings(cfg, lambda: self._copy_reply(session.hwnd))
+        return self.replies[key]
+
+    def send_prompt(self, text, ask_user_callback, project_path=None):
+        """Blocking wrapper around send_prompt_async (for callers without an event loop)."""
+        return asyncio.run(self.send_prompt_async(text, ask_user_callback, project_path))
+
+    async def send_prompt_async(self, text, ask_user_callback, project_path=None):
+        """
+        Run the focus / paste / submit sequence, wait for the IDE and collect the result.
+
+        The prompt goes to the window of `project_path` (no project: the most
+        recently used session; an unknown project is an error, never another
+        project's window); prompts for one window never overlap.
+        Blocking GUI calls go to the automation thread one step at a time; the
+        pauses in between are asyncio sleeps, so the bot keeps serving updates.
+        ask_user_callback(frame, button_info) may be a plain function or a coroutine.
+        """
+        if project_path:
+            session = self.sessions.get(project_path)
+            if session is None:
+                name = folder_name(project_path) or project_path
+                return {"ai_reply": f"❌ Error: Antigravity window for {name} not found. /project to pick one.",
+                        "local_url": None, "tunnel_url": None, "screenshot": None}
+        else:
+            # No project named: the most recent session, else whichever Antigravity window is there
+            session = self.sessions.default() or self.sessions.register("Antigravity", None)
+        async with session.lock:
+            session.last_used = time.time()
+            with metrics.span("total"):
+                return await self._send_prompt_locked(session, text, ask_user_callback)
+
+    async def _send_prompt_locked(self, session, text, ask_user_callback):
+        cfg = project_settings(session.project_path)
+        async with self.desk_lock:
+            ok, result = await self._drive_prompt(session, text, ask_user_callback, cfg)
+        if not ok: return result
+
+        # TUNNELING LOGIC (network / subprocess work stays off the automation thread,
+        # and outside the desk lock so the next project's prompt can start)
+        ai_reply = result["ai_reply"]
+        local_url = None
+        tunnel_url = None
         
-        if not self.hwnd or not is_window_valid(self.hwnd):
-            log.info("HWND invalid, re-detecting Antigravity window...")
-            hwnds = self._find_antigravity_windows()
-            if hwnds:
-                self.hwnd = hwnds[0]
-            else:
-                return {"ai_reply": "❌ Error: Antigravity window not found.", "local_url": None, "tunnel_url": None, "screenshot": None}
+        # 1. Detect port in text
+        port_match = re.search(r':(\d{4,5})', ai_reply)
+        if port_match:
+            detected_port = int(port_match.group(1))
+        else:
+            with metrics.span("port_discovery"):
+                detected_port = await tunnel.discovery.discover(parse_ports(cfg["DEV_SERVER_PORTS"]))
+        
+        if detected_port:
+            local_url = f"http://localhost:{detected_port}"
+            # Wait for port to be ready
+            with metrics.span("port_wait"):
+                port_ready = await tunnel.discovery.wait_for_port(detected_port, timeout=10)
+            if port_ready:
+                with metrics.span("tunnel"):
+                    tunnel_url = await asyncio.to_thread(tunnel.create_tunnel, detected_port)
+
+        return dict(result, local_url=local_url, tunnel_url=tunnel_url)
+
+    async def _drive_prompt(self, session, text, ask_user_callback, cfg) -> tuple:
+        """Input, wait and capture for one prompt; returns (ok, result)."""
+        log.info(f"--- STARTING GUARANTEED FOCUS SEQUENCE for: {text[:20]}... ({session.name}) ---")
+        
+        if not session.hwnd or not is_window_valid(session.hwnd):
+            log.info(f"HWND invalid, re-detecting Antigravity window for {session.name}...")
+            with metrics.span("find_window"):
+                await self._gui(self.sessions.resolve, session)
+            if not session.hwnd:
+                return False, {"ai_reply": f"❌ Error: Antigravity window for {session.name} not found.", "local_url": None, "tunnel_url": None, "screenshot": None}
+        hwnd = session.hwnd
+
+        # Each step waits for its effect to show (short poll, timeout) instead of a fixed sleep
+        timeout, poll = cfg["READY_TIMEOUT_SECONDS"], cfg["READY_POLL_INTERVAL"]
+        replies = self._reply_extractor(session, cfg)
+        is_foreground = lambda: get_foreground_hwnd() == hwnd
+        grab_window = lambda: self._grab_window(hwnd, cfg)
+        grab_chat_input = lambda: self._grab_chat_input(hwnd, cfg)
 
         try:
             # Get window rectangle for coordinate calculations
-            rect = RECT()
-            user32.GetWindowRect(self.hwnd, ctypes.byref(rect))
-            win_left, win_top = rect.left, rect.top
-            win_width = rect.right - rect.left
-            win_height = rect.bottom - rect.top
+            win_left, win_top, win_right, win_bottom = get_window_rect(hwnd)
+            win_width = win_right - win_left
+            win_height = win_bottom - win_top
             log.info(f"Window rect: {win_left},{win_top} size {win_width}x{win_height}")
             
             # 1. Force Awake & Foreground
             log.info("Step 1: Force window to foreground")
-            if user32.IsIconic(self.hwnd):
-                user32.ShowWindow(self.hwnd, 9)  # SW_RESTORE
-            user32.SetForegroundWindow(self.hwnd)
-            time.sleep(0.5)
+            with metrics.span("step1_focus"):
+                await self._gui(self._bring_to_front, hwnd)
+                if not await wait_until(is_foreground, timeout, poll):
+                    log.warning("Window did not come to the foreground, continuing")
             
             # 2. Click on the window center first to ensure it's focused
             center_x = win_left + win_width // 2
             center_y = win_top + win_height // 2
             log.info(f"Step 2: Click center to focus window ({center_x}, {center_y})")
-            pyautogui.click(center_x, center_y)
-            time.sleep(0.3)
+            with metrics.span("step2_click_center"):
+                await self._gui(pyautogui.click, center_x, center_y)
+                await wait_until(is_foreground, timeout, poll)
             
             # 3. Use keyboard shortcut Ctrl+Shift+I to open Antigravity chat
             # (This is the inline chat shortcut in VS Code based editors)
             log.info("Step 3: Open inline chat with Ctrl+I")
-            pyautogui.hotkey('ctrl', 'i')
-            time.sleep(1.0)
+            with metrics.span("step3_open_chat"):
+                window_watch = await self._arm_watch(grab_window, cfg)
+                await self._gui(pyautogui.hotkey, 'ctrl', 'i')
+                # No change is fine too (chat already open), so this wait stays short
+                await self._wait_changed(window_watch, grab_window, cfg["CHAT_OPEN_TIMEOUT_SECONDS"], poll)
             
             # 4. If that didn't work, try clicking on the chat panel area
             # Antigravity chat is typically on the right side, bottom portion
@@ -377,113 +730,133 @@ class AntigravityController:
             chat_input_x = win_left + int(win_width * 0.75)  # 75% from left (right panel)
             chat_input_y = win_top + int(win_height * 0.85)   # 85% from top (bottom of panel)
             log.info(f"Step 4: Click chat input area ({chat_input_x}, {chat_input_y})")
-            pyautogui.click(chat_input_x, chat_input_y)
-            time.sleep(0.3)
+            with metrics.span("step4_click_input"):
+                await self._gui(pyautogui.click, chat_input_x, chat_input_y)
+                await wait_until(is_foreground, timeout, poll)
             
             # 5. Triple-click to select all in current input, then delete
             log.info("Step 5: Clear any existing text (triple-click + delete)")
-            pyautogui.click(chat_input_x, chat_input_y, clicks=3)
-            time.sleep(0.2)
-            pyautogui.press('delete')
-            time.sleep(0.2)
+            with metrics.span("step5_clear_input"):
+                await self._gui(pyautogui.click, chat_input_x, chat_input_y, clicks=3)
+                await self._gui(pyautogui.press, 'delete')
+                await asyncio.sleep(poll)
             
-            # 6. Type the prompt using pyautogui.write() for reliability
-            # First copy to clipboard as backup
+            # 6. Paste the prompt via the clipboard, then wait for it to appear in the input
             log.info(f"Step 6: Type prompt ({len(text)} chars)")
-            pyperclip.copy(text)
-            
-            # Use Ctrl+V to paste (more reliable than typing for special characters)
-            pyautogui.hotkey('ctrl', 'v')
-            time.sleep(0.5)
+            with metrics.span("step6_paste"):
+                input_watch = await self._arm_watch(grab_chat_input, cfg, grid=(32, 6))
+                await self._gui(self._paste_text, text)
+                if not await self._wait_changed(input_watch, grab_chat_input, timeout, poll):
+                    log.warning(f"Pasted text not seen in the chat input after {timeout:.1f}s, continuing")
             
             # 7. Take a screenshot to verify text was entered
             log.info("Step 7: Verifying text entry...")
-            verify_ss = pyautogui.screenshot()
-            verify_ss.save(str(Path(__file__).parent / "verify_prompt.png"))
+            with metrics.span("step7_verify"):
+                verify_ss, _ = await self._gui(grab_frame, hwnd, cfg)
+                save_screenshot_debug(verify_ss, "verify_prompt")
             
-            # 8. Submit with Enter
+            # 8. Submit with Enter; the input clears (or the panel scrolls) once it is accepted
             log.info("Step 8: Submit prompt (Enter)")
-            pyautogui.press('enter')
-            time.sleep(0.5)
+            with metrics.span("step8_submit"):
+                input_watch = await self._arm_watch(grab_chat_input, cfg, grid=(32, 6))
+                await self._gui(replies.mark)
+                await self._gui(pyautogui.press, 'enter')
+                if not await self._wait_changed(input_watch, grab_chat_input, timeout, poll):
+                    log.warning(f"No reaction to Enter after {timeout:.1f}s, continuing")
             
             log.info("=== PROMPT SEQUENCE COMPLETE ===")
 
         except Exception as e:
             log.error(f"CRITICAL: Focus sequence failed: {e}")
-            return {"ai_reply": f"❌ Focus Error: {e}", "local_url": None, "tunnel_url": None, "screenshot": None}
+            return False, {"ai_reply": f"❌ Focus Error: {e}", "local_url": None, "tunnel_url": None, "screenshot": None}
 
-        self._wait_with_detection(ask_user_callback)
+        with metrics.span("wait"):
+            await self._wait_with_detection(session, ask_user_callback, cfg)
         
-        # Capture AI Text (if possible via clipboard)
+        # Capture only the new AI text (file tail, else clipboard diffed against the last copy)
         ai_reply = "✅ Task processed."
         try:
-            pyautogui.hotkey('ctrl', 'a')
-            pyautogui.hotkey('ctrl', 'c')
-            time.sleep(0.1)
-            ai_reply = pyperclip.paste()
-        except: pass
+            with metrics.span("read_reply"):
+                ai_reply = await self._gui(replies.read) or ai_reply
+            log.info(f"Reply: {len(ai_reply)} new chars via {replies.last_source or 'none'}")
+        except Exception as e:  # not bare: a /cancel (CancelledError) during the read must propagate
+            log.warning(f"Reply capture failed: {e}")
 
-        # TUNNELING LOGIC
-        local_url = None
-        tunnel_url = None
-        
-        # 1. Detect port in text
-        port_match = re.search(r':(\d{4,5})', ai_reply)
-        detected_port = int(port_match.group(1)) if port_match else tunnel.detect_dev_server()
-        
-        if detected_port:
-            local_url = f"http://localhost:{detected_port}"
-            # Wait for port to be ready
-            for _ in range(10):
-                if tunnel.is_port_open(detected_port):
-                    tunnel_url = tunnel.create_tunnel(detected_port)
-                    break
-                time.sleep(1)
+        with metrics.span("final_screenshot"):
+            screenshot = await self._gui(take_screenshot_secure, hwnd, cfg)
+        return True, {"ai_reply": ai_reply, "local_url": None, "tunnel_url": None,
+                      "screenshot": screenshot, "before": verify_ss}
 
-        ss_path = take_screenshot_secure()
-        return {
-            "ai_reply": ai_reply,
-            "local_url": local_url,
-            "tunnel_url": tunnel_url,
-            "screenshot": ss_path
-        }
+    def _grab_window(self, hwnd, cfg):
+        return grab_frame(hwnd, cfg)[0]
 
-    def _wait_with_detection(self, ask_user_callback, timeout=180):
+    def _grab_chat_input(self, hwnd, cfg):
+        region = parse_regions(cfg["CHAT_INPUT_REGION"]) or [(0.5, 0.78, 1, 0.92)]
+        return grab_screen_box(*sub_box(get_window_rect(hwnd), region[0]))
+
+    def _region_changed(self, tracker, grab) -> bool:
+        """Automation-thread half of a readiness check: capture + compare with the baseline."""
+        return tracker.observe(grab())
+
+    async def _arm_watch(self, grab, cfg, grid=(96, 54)):
+        """A tracker holding the current capture as its baseline."""
+        tracker = StabilityTracker(grid=grid, pixel_delta=cfg["READY_PIXEL_DELTA"], min_changed_cells=1)
+        await self._gui(self._region_changed, tracker, grab)
+        return tracker
+
+    async def _wait_changed(self, tracker, grab, timeout, poll) -> bool:
+        return await wait_until(lambda: self._gui(self._region_changed, tracker, grab), timeout, poll)
+
+    def _observe_frame(self, hwnd, stability, cfg=None):
+        """Automation-thread half of one wait-loop tick: capture + signature."""
+        with metrics.span("wait_capture"):
+            frame, origin = grab_frame(hwnd, cfg)
+            return frame, origin, stability.observe(frame)
+
+    async def _wait_with_detection(self, session, ask_user_callback, cfg=None):
+        cfg = cfg or SETTINGS
         start = time.time()
-        last_ss = pyautogui.screenshot()
-        stable_since = None
-        last_check = 0
+        stability = StabilityTracker(
+            pixel_delta=cfg["STABILITY_PIXEL_DELTA"],
+            min_changed_cells=cfg["STABILITY_MIN_CHANGED_CELLS"],
+            ignore=ignore_regions(cfg),
+        )
+        poller = AdaptivePoller.from_settings(cfg, now=start)
+        await self._gui(self._observe_frame, session.hwnd, stability, cfg)
+        window = cfg["STABILITY_WINDOW_SECONDS"]
         
-        while time.time() - start < timeout:
-            time.sleep(1)
-            current_ss = pyautogui.screenshot()
+        while time.time() - start < cfg["WAIT_TIMEOUT_SECONDS"]:
+            # Never sleep past the moment the stability window could complete
+            remaining = window - stability.stable_for()
+            await asyncio.sleep(max(poller.min_interval, min(poller.next_interval(), remaining)))
+
+            # Check stability on downsampled signatures (cursor blink / clock ignored)
+            current_ss, origin, changed = await self._gui(self._observe_frame, session.hwnd, stability, cfg)
+            poller.record(changed)
             
-            # Streaming SS
-            stream_path = str(Path(__file__).parent / "stream_temp.png")
-            current_ss.save(stream_path)
-            self.latest_stream_ss = stream_path
-
-            # Detect blocking prompts
-            if time.time() - last_check > 4:
-                last_check = time.time()
-                button_info = detector.detect_accept_deny_prompt(current_ss)
+            # Streaming SS (kept in memory, per window for /live)
+            session.latest_stream_ss = current_ss
+
+            # Detect blocking prompts (cadence follows the change rate)
+            if poller.should_detect():
+                with metrics.span("wait_detect"):
+                    button_info = await self._gui(detector.detect_accept_deny_prompt, current_ss)
                 if button_info:
-                    response = ask_user_callback(stream_path, button_info)
-                    focus_window_by_hwnd(self.hwnd)
-                    if response == "deny": detector.click_deny(button_info["deny_pos"])
-                    else: detector.click_accept(button_info["accept_pos"])
+                    button_info = translate_hit(button_info, origin)  # frame -> screen coords
+                    response = ask_user_callback(current_ss, button_info)
+                    if inspect.isawaitable(response): response = await response
+                    await self._gui(focus_window_by_hwnd, session.hwnd)
+                    if response == "deny": await self._gui(detector.click_deny, button_info["deny_pos"])
+                    else: await self._gui(detector.click_accept, button_info["accept_pos"])
+                    poller.reset()
                     continue
 
-            # Check stability
-            diff = ImageChops.difference(last_ss, current_ss)
-            if not diff.getbbox():
-                if stable_since is None: stable_since = time.time()
-                elif time.time() - stable_since >= 3: return
-            else:
-                stable_since = None
-                last_ss = current_ss
+            if stability.stable_for() >= window:
+                log.info(f"Screen settled after {time.time() - start:.1f}s ({poller.frames} frames, {poller.changes} changes)")
+                return
+        log.warning(f"Wait timed out after {cfg['WAIT_TIMEOUT_SECONDS']:.0f}s")
 
-controller = AntigravityController()
+controller: Optional[AntigravityController] = None
 
 # ==============================================================================
 # USER STATE
@@ -502,84 +875,747 @@ def get_user_state(user_id):
 
 def set_user_state(user_id, state, path=None):
     user_states[user_id] = {"state": state, "path": path or user_states.get(user_id, {}).get("path")}
+    if store: store.save_user(user_id, state.value, user_states[user_id]["path"])
+
+# handle_message runs with block=False, so one user's messages can overlap; the state
+# machine (read state, act, set state) runs under the user's lock, in arrival order
+user_locks = {}
+
+def user_lock(user_id) -> asyncio.Lock:
+    if user_id not in user_locks: user_locks[user_id] = asyncio.Lock()
+    return user_locks[user_id]
+
+# ==============================================================================
+# JOB QUEUE
+# ==============================================================================
+class JobState(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class Job:
+    def __init__(self, job_id: int, user_id: int, text: str, project: Optional[str] = None):
+        self.id = job_id
+        self.user_id = user_id
+        self.text = text
+        self.project = project
+        self.state = JobState.QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.task = None
+        self.done = asyncio.Event()
+
+    @property
+    def wait_seconds(self) -> float:
+        """Time spent queued before the worker picked the job up."""
+        return (self.started or self.finished or time.time()) - self.created
+
+    @property
+    def run_seconds(self) -> float:
+        if self.started is None: return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def summary(self) -> str:
+        line = f"#{self.id} {self.state.value} - {self.text[:40]!r}"
+        line += f"\n   waited {self.wait_seconds:.1f}s"
+        if self.started: line += f", ran {self.run_seconds:.1f}s"
+        if self.error: line += f"\n   error: {self.error}"
+        return line
+
+class JobQueue:
+    """
+    One FIFO of prompt jobs per project, each drained by its own worker task,
+    so prompts for one window run in order while other projects' jobs are not
+    stuck behind them. (The controller still takes turns on the shared screen.)
+    """
+
+    def __init__(self, runner: Callable, history: int = 50):
+        self.runner = runner          # async (job) -> result dict
+        self.history = history        # finished jobs kept for /status
+        self.jobs = {}                # id -> Job, insertion ordered
+        self.running = {}             # project key -> running Job
+        self.on_change = None         # fn(job) on every state change (persistence)
+        self._ids = itertools.count(1)
+        self._queues = {}             # project key -> asyncio.Queue
+        self._workers = {}            # project key -> worker task
+
+    def resume_ids(self, last_id: int):
+        """Continue numbering after the jobs of a previous run."""
+        self._ids = itertools.count(last_id + 1)
+
+    def _changed(self, job: Job):
+        if self.on_change: self.on_change(job)
+
+    @staticmethod
+    def key(project: Optional[str]) -> str:
+        return normalize_path(project) if project else ""
+
+    def submit(self, user_id: int, text: str, project: Optional[str] = None) -> Job:
+        key = self.key(project)
+        if key not in self._queues: self._queues[key] = asyncio.Queue()
+        worker = self._workers.get(key)
+        if worker is None or worker.done():
+            self._workers[key] = asyncio.get_running_loop().create_task(self._run(key))
+        job = Job(next(self._ids), user_id, text, project)
+        self.jobs[job.id] = job
+        self._queues[key].put_nowait(job)
+        self._changed(job)
+        log.info(f"Job #{job.id} queued (depth {self.depth()})")
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def queued(self) -> list:
+        return [j for j in self.jobs.values() if j.state == JobState.QUEUED]
+
+    def active(self) -> list:
+        """Running jobs first, then queued ones, in id order."""
+        return sorted(self.running.values(), key=lambda j: j.id) + self.queued()
+
+    def depth(self) -> int:
+        return len(self.queued())
+
+    def position(self, job: Job) -> int:
+        """Jobs ahead of this one for the same project (including the running one)."""
+        key = self.key(job.project)
+        ahead = sum(1 for j in self.queued() if j.id < job.id and self.key(j.project) == key)
+        current = self.running.get(key)
+        return ahead + (1 if current and current is not job else 0)
+
+    def cancel(self, job_id: int) -> bool:
+        job = self.jobs.get(job_id)
+        if not job or job.state not in (JobState.QUEUED, JobState.RUNNING): return False
+        job.cancel_requested = True
+        if job.state == JobState.RUNNING and job.task:
+            job.task.cancel()
+        else:
+            self._finish(job, JobState.CANCELLED)
+        return True
+
+    def stats(self) -> dict:
+        finished = [j for j in self.jobs.values() if j.state in (JobState.DONE, JobState.FAILED)]
+        avg = lambda xs: sum(xs) / len(xs) if xs else 0.0
+        return {
+            "depth": self.depth(),
+            "running": [j.id for j in self.running.values()],
+            "finished": len(finished),
+            "avg_wait": avg([j.wait_seconds for j in finished]),
+            "avg_run": avg([j.run_seconds for j in finished]),
+        }
+
+    def _finish(self, job: Job, state: JobState):
+        job.state = state
+        job.finished = time.time()
+        job.done.set()
+        self._changed(job)
+        log.info(f"Job #{job.id} {state.value}: waited {job.wait_seconds:.1f}s, ran {job.run_seconds:.1f}s")
+        done = [j.id for j in self.jobs.values() if j.done.is_set()]
+        for old_id in done[:max(0, len(done) - self.history)]:
+            del self.jobs[old_id]
+
+    async def _run(self, key: str):
+        queue = self._queues[key]
+        while True:
+            job = await queue.get()
+            if job.state != JobState.QUEUED: continue  # cancelled while waiting
+            self.running[key] = job
+            job.state = JobState.RUNNING
+            job.started = time.time()
+            metrics.observe("queue_wait", job.wait_seconds)
+            self._changed(job)
+            job.task = asyncio.get_running_loop().create_task(self.runner(job))
+            try:
+                job.result = await job.task
+                self._finish(job, JobState.DONE)
+            except asyncio.CancelledError:
+                if not job.cancel_requested: raise
+                self._finish(job, JobState.CANCELLED)
+            except Exception as e:
+                job.error = str(e)
+                self._finish(job, JobState.FAILED)
+            finally:
+                self.running.pop(key, None)
+
+async def _run_prompt_job(job: Job) -> dict:
+    return await controller.send_prompt_async(job.text, lambda s, b: "accept", job.project)
+
+job_queue = JobQueue(_run_prompt_job)
+
+# ==============================================================================
+# LIVE VIEW
+# ==============================================================================
+class LiveView:
+    """
+    Streams a session's latest_stream_ss into a single Telegram photo that is
+    edited in place. Frames are rate-capped at LIVE_MAX_FPS and only sent
+    when their signature differs enough from the last frame sent, so Bot API
+    calls scale with how much the screen actually changes.
+    """
+
+    def __init__(self, bot, chat_id: int, cfg: dict, project: Optional[str] = None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.cfg = cfg
+        self.project = project
+        self.message_id = None
+        self.task = None
+        self.stopped = False
+        self.sent = 0
+        self.skipped = 0
+        self.tracker = StabilityTracker(
+            pixel_delta=cfg["LIVE_PIXEL_DELTA"],
+            min_changed_cells=cfg["LIVE_MIN_CHANGED_CELLS"],
+            ignore=ignore_regions(cfg),
+        )
+        self.markup = InlineKeyboardMarkup([[InlineKeyboardButton("⏹ Stop live view", callback_data="live:stop")]])
+
+    def stop(self):
+        self.stopped = True
+
+    async def run(self):
+        interval = 1.0 / max(self.cfg["LIVE_MAX_FPS"], 0.01)
+        last_frame = None
+        last_activity = time.time()
+        try:
+            while not self.stopped:
+                await asyncio.sleep(interval)
+                session = controller.sessions.get(self.project) or controller.sessions.default()
+                frame = session.latest_stream_ss if session else None
+                if frame is None or frame is last_frame:
+                    idle = time.time() - last_activity
+                    if not job_queue.running and idle > self.cfg["LIVE_IDLE_STOP_SECONDS"]: break
+                    continue
+                last_frame = frame
+                last_activity = time.time()
+                if not await asyncio.to_thread(self.tracker.observe, frame):
+                    self.skipped += 1
+                    continue
+                await self._send(frame)
+        except Exception as e:
+            log.error(f"Live view error: {e}")
+        finally:
+            live_views.pop(self.chat_id, None)
+            await self._close()
+
+    async def _send(self, frame):
+        photo = (await encoder.encode_async(frame, "fast"))["data"]
+        caption = f"🔴 Live · {datetime.now():%H:%M:%S}"
+        try:
+            if self.message_id is None:
+                msg = await self.bot.send_photo(self.chat_id, photo, caption=caption, reply_markup=self.markup)
+                self.message_id = msg.message_id
+            else:
+                await self.bot.edit_message_media(
+                    media=InputMediaPhoto(photo, caption=caption),
+                    chat_id=self.chat_id, message_id=self.message_id, reply_markup=self.markup)
+            self.sent += 1
+        except RetryAfter as e:
+            delay = e.retry_after
+            await asyncio.sleep(delay.total_seconds() if hasattr(delay, "total_seconds") else delay)
+        except TelegramError as e:  # BadRequest, TimedOut, NetworkError: skip the frame, keep the view
+            log.warning(f"Live view frame dropped: {e}")
+
+    async def _close(self):
+        log.info(f"Live view for chat {self.chat_id} stopped ({self.sent} sent, {self.skipped} skipped)")
+        if self.message_id is None: return
+        try:
+            await self.bot.edit_message_caption(
+                chat_id=self.chat_id, message_id=self.message_id,
+                caption=f"⏹ Live view ended ({self.sent} frames sent, {self.skipped} unchanged skipped)")
+        except Exception:
+            pass
+
+live_views = {}  # chat_id -> LiveView
 
 # ==============================================================================
 # TELEGRAM HANDLERS
 # ==============================================================================
+def is_authorized(user_id: int) -> bool:
+    return ALLOWED_USER_ID == 0 or user_id == ALLOWED_USER_ID
+
+async def admit(update: Update, kind: str) -> bool:
+    """Whitelist + per-kind rate limit; replies when the user is throttled."""
+    user_id = update.effective_user.id
+    if not is_authorized(user_id): return False
+    if not rate_limiter.is_allowed(user_id, kind):
+        log.warning(f"Rate limited {user_id} ({kind}); rejections so far: {rate_limiter.stats()['rejected']}")
+        await update.effective_message.reply_text("⏱️ Rate limited.")
+        return False
+    return True
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     log.info(f"Msg from {user_id}: {update.message.text[:50]}")
-    if ALLOWED_USER_ID != 0 and user_id != ALLOWED_USER_ID: return
+    if not is_authorized(user_id): return
     
     text = update.message.text
-    state_data = get_user_state(user_id)
-    state = state_data["state"]
-
-    if state == UserState.WAITING_FOR_PATH:
-        msg = await update.message.reply_text("📂 Opening project...")
-        success, info, screenshot = await asyncio.to_thread(controller.open_folder, text)
-        if success:
-            await update.message.reply_photo(screenshot, caption=f"Opened: {text}\nConfirm? (yes/no)")
-            secure_delete(screenshot)
-            set_user_state(user_id, UserState.WAITING_FOR_CONFIRMATION, text)
-        else:
-            await update.message.reply_text(f"❌ Error: {info}")
+    # Only the wait for a prompt's job happens outside the lock
+    async with user_lock(user_id):
+        state_data = get_user_state(user_id)
+        state = state_data["state"]
 
-    elif state == UserState.WAITING_FOR_CONFIRMATION:
-        if text.lower() in ['y', 'yes']:
-            set_user_state(user_id, UserState.READY_FOR_PROMPTS, state_data["path"])
-            await update.message.reply_text("✅ Ready for prompts.")
-        else:
-            set_user_state(user_id, UserState.WAITING_FOR_PATH)
-            await update.message.reply_text("Send path again.")
+        if state == UserState.WAITING_FOR_PATH:
+            if not rate_limiter.is_allowed(user_id, "open"):
+                await update.message.reply_text("⏱️ Rate limited.")
+                return
+            msg = await update.message.reply_text("📂 Opening project...")
+            success, info, screenshot = await controller.open_folder_async(text)
+            if success:
+                if screenshot:
+                    await media.send_photo(update.message.reply_photo, screenshot, caption=f"Opened: {text}\nConfirm? (yes/no)")
+                else:
+                    await update.message.reply_text(f"Opened: {text}\nConfirm? (yes/no)")
+                set_user_state(user_id, UserState.WAITING_FOR_CONFIRMATION, text)
+            else:
+                await update.message.reply_text(f"❌ Error: {info}")
+            return
 
-    elif state == UserState.READY_FOR_PROMPTS:
-        if not rate_limiter.is_allowed(user_id):
+        if state == UserState.WAITING_FOR_CONFIRMATION:
+            if text.lower() in ['y', 'yes']:
+                set_user_state(user_id, UserState.READY_FOR_PROMPTS, state_data["path"])
+                await update.message.reply_text("✅ Ready for prompts.")
+            else:
+                set_user_state(user_id, UserState.WAITING_FOR_PATH)
+                await update.message.reply_text("Send path again.")
+            return
+
+        if state != UserState.READY_FOR_PROMPTS: return
+        if not rate_limiter.is_allowed(user_id, "prompt"):
             await update.message.reply_text("⏱️ Rate limited.")
             return
 
-        status_msg = await update.message.reply_text("🤖 Working...")
-        
-        def run_task():
-            return controller.send_prompt(text, lambda s, b: "accept")
+        # One worker drains the queue in order; this handler just waits for its job
+        log.info(f"Queueing prompt task for: {text[:30]}...")
+        job = job_queue.submit(user_id, text, state_data["path"])
+        ahead = job_queue.position(job)
+        if ahead:
+            status_msg = await update.message.reply_text(f"🕒 Queued as job #{job.id} ({ahead} ahead). /cancel {job.id} to drop it.")
+        else:
+            status_msg = await update.message.reply_text(f"🤖 Working... (job #{job.id})")
 
-        # Run the blocking task in a thread and await it
-        log.info(f"Executing prompt task for: {text[:30]}...")
-        result = await asyncio.to_thread(run_task)
-        log.info("Prompt task completed!")
-        
-        await context.bot.delete_message(update.effective_chat.id, status_msg.message_id)
+    await job.done.wait()
+    log.info(f"Prompt job #{job.id} finished: {job.state.value}")
+    
+    await context.bot.delete_message(update.effective_chat.id, status_msg.message_id)
+
+    if job.state == JobState.CANCELLED:
+        await update.message.reply_text(f"🛑 Job #{job.id} cancelled.")
+        return
+    if job.state == JobState.FAILED:
+        await update.message.reply_text(f"❌ Job #{job.id} failed: {job.error}")
+        return
+    result = job.result
 
-        reply = result["ai_reply"][:1000]
-        if result["local_url"]: reply += f"\n\n🏠 **Local:** {result['local_url']}"
-        if result["tunnel_url"]: reply += f"\n🌐 **Public:** {result['tunnel_url']}"
+    reply = result["ai_reply"][:1000]
+    if result["local_url"]: reply += f"\n\n🏠 **Local:** {result['local_url']}"
+    if result["tunnel_url"]: reply += f"\n🌐 **Public:** {result['tunnel_url']}"
 
-        if result["screenshot"]:
-            await update.message.reply_photo(result["screenshot"], caption=reply)
-            secure_delete(result["screenshot"])
-        else:
-            await update.message.reply_text(reply)
+    if result["screenshot"] and result.get("before") and SETTINGS["PHOTO_BEFORE_AFTER"]:
+        await media.send_pair(context.bot, update.effective_chat.id, result["before"], result["screenshot"], caption=reply)
+    elif result["screenshot"]:
+        await media.send_photo(update.message.reply_photo, result["screenshot"], caption=reply)
+    else:
+        await update.message.reply_text(reply)
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Checked before any state is set: strangers must not get a row in the state store
+    if not await admit(update, "command"): return
     await controller.cmd_start(update, context)
 
+def _job_arg(context) -> Optional[int]:
+    try:
+        return int(context.args[0].lstrip("#"))
+    except (IndexError, ValueError, TypeError):
+        return None
+
+async def cmd_queue(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await admit(update, "command"): return
+    user_id = update.effective_user.id
+    st = job_queue.stats()
+    lines = [f"📋 Queue depth: {st['depth']}"]
+    for job in job_queue.active():
+        text = job.text[:40] if job.user_id == user_id else "(other user)"
+        lines.append(f"#{job.id} {job.state.value} {job.wait_seconds + job.run_seconds:.0f}s - {text}")
+    lines.append(f"Avg wait {st['avg_wait']:.1f}s / run {st['avg_run']:.1f}s over {st['finished']} jobs")
+    await update.message.reply_text("\n".join(lines))
+
+async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await admit(update, "command"): return
+    user_id = update.effective_user.id
+    job = job_queue.get(_job_arg(context))
+    if not job or job.user_id != user_id:
+        await update.message.reply_text("Usage: /status <job id> (see /queue)")
+        return
+    position = job_queue.position(job) if job.state == JobState.QUEUED else None
+    await update.message.reply_text(job.summary() + (f"\n   {position} ahead" if position else ""))
+
+async def cmd_live(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await admit(update, "command"): return
+    chat_id = update.effective_chat.id
+    view = live_views.get(chat_id)
+    if context.args and context.args[0].lower() in ("off", "stop"):
+        if view:
+            view.stop()
+            await update.message.reply_text("⏹ Stopping live view...")
+        else:
+            await update.message.reply_text("Live view is not running.")
+        return
+    if view:
+        await update.message.reply_text("Live view is already running. /live off to stop.")
+        return
+    project = get_user_state(update.effective_user.id)["path"]
+    view = LiveView(context.bot, chat_id, project_settings(project), project)
+    live_views[chat_id] = view
+    view.task = asyncio.get_running_loop().create_task(view.run())
+    await update.message.reply_text("🔴 Live view on. Frames are sent only when the screen changes. Tap Stop or /live off to end.")
+
+async def on_live_stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if is_authorized(query.from_user.id):
+        view = live_views.get(query.message.chat.id)
+        if view: view.stop()
+    await query.answer("Live view stopped")
+
+async def cmd_tunnels(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await admit(update, "command"): return
+    args = [a.lower() for a in context.args or []]
+    if args[:1] == ["close"]:
+        if args[1:2] == ["all"]:
+            await asyncio.to_thread(tunnel.kill_all)  # each close may wait on cloudflared
+            await update.message.reply_text("🧹 All tunnels closed.")
+            return
+        try:
+            port = int(args[1])
+        except (IndexError, ValueError):
+            await update.message.reply_text("Usage: /tunnels close <port|all>")
+            return
+        closed = await asyncio.to_thread(tunnel.close, port)
+        await update.message.reply_text(f"🧹 Tunnel for :{port} closed." if closed else f"No tunnel on :{port}.")
+        return
+
+    tunnels = await asyncio.to_thread(tunnel.list_tunnels)
+    if not tunnels:
+        await update.message.reply_text("No open tunnels.")
+        return
+    now = datetime.now()
+    lines = ["🌐 Open tunnels:"]
+    for t in tunnels:
+        idle = int((now - t["last_used"]).total_seconds() // 60)
+        lines.append(f":{t['port']} → {t['url']} (idle {idle}m)")
+    lines.append(f"Idle tunnels close after {TUNNEL_TIMEOUT_MINUTES}m. /tunnels close <port|all>")
+    await update.message.reply_text("\n".join(lines))
+
+async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await admit(update, "command"): return
+    rows = metrics.summary()
+    if not rows:
+        await update.message.reply_text("No prompts timed yet.")
+        return
+    lines = ["⏱️ Stage timings (n · p50 · p95 · max):"]
+    for stage, count, mean, p50, p95, peak in rows:
+        lines.append(f"{stage}: {count} · {p50:.2f}s · {p95:.2f}s · {peak:.2f}s")
+    st = job_queue.stats()
+    lines.append(f"Queue depth {st['depth']}, rate-limited {sum(rate_limiter.rejected.values())}")
+    if media:
+        ms = media.stats()
+        lines.append(f"Photos: {ms['uploads']} uploaded ({ms['bytes_sent'] / 1024:.0f} KiB), {ms['reused']} re-sent by file_id")
+    if metrics_server: lines.append(f"Prometheus: http://127.0.0.1:{metrics_server.port}/metrics (on the PC)")
+    await update.message.reply_text("\n".join(lines))
+
+def _find_project(arg: str, sessions: list):
+    """Session named by path, list number or folder name."""
+    target = controller.sessions.get(arg)
+    if target is None and arg.isdigit() and 0 < int(arg) <= len(sessions):
+        target = sessions[int(arg) - 1]
+    if target is None:
+        target = next((s for s in sessions if s.name.lower() == arg.lower()), None)
+    return target
+
+async def cmd_project(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /project lists open projects; /project <name|number|path> switches
+    without reopening; /project close <name|number|path> forgets one.
+    """
+    if not await admit(update, "command"): return
+    user_id = update.effective_user.id
+    current = controller.sessions.get(get_user_state(user_id)["path"])
+    sessions = controller.sessions.list()
+    if not context.args:
+        if not sessions:
+            await update.message.reply_text("No projects open. /start to open one.")
+            return
+        lines = ["📁 Projects:"]
+        for n, session in enumerate(sessions, 1):
+            alive = session.hwnd and is_window_valid(session.hwnd)
+            mark = "▶" if session is current else " "
+            lines.append(f"{mark} {n}. {session.name} {'🟢' if alive else '⚪ (window closed)'}\n     {session.project_path}")
+        lines.append("/project <name|number|path> to switch, /project close <name|number|path> to forget.")
+        await update.message.reply_text("\n".join(lines))
+        return
+
+    if context.args[0].lower() == "close":
+        await _close_project(update, " ".join(context.args[1:]), sessions)
+        return
+
+    arg = " ".join(context.args)
+    target = _find_project(arg, sessions)
+    if target is None:
+        # Not opened through the bot: adopt a window already showing that folder
+        hwnd = await controller._gui(controller.sessions.find_window, arg, None, True)
+        if hwnd is None:
+            await update.message.reply_text(f"No open window for {arg!r}. /start to open it.")
+            return
+        target = controller.sessions.register(arg, hwnd)
+    set_user_state(user_id, UserState.READY_FOR_PROMPTS, target.project_path)
+    await update.message.reply_text(f"✅ Prompts now go to {target.name} ({target.project_path}).")
+
+async def _close_project(update: Update, arg: str, sessions: list):
+    """Drop the session (and its stored row); the window itself stays open."""
+    target = _find_project(arg, sessions) if arg else None
+    if target is None:
+        await update.message.reply_text("Usage: /project close <name|number|path> (see /project)")
+        return
+    key = job_queue.key(target.project_path)
+    if key in job_queue.running or any(job_queue.key(j.project) == key for j in job_queue.queued()):
+        await update.message.reply_text(f"{target.name} has jobs in /queue; cancel them first.")
+        return
+    controller.sessions.forget(target.project_path)
+    # Users who were prompting it pick a project again instead of landing in another window
+    for user_id, data in list(user_states.items()):
+        if data["path"] and job_queue.key(data["path"]) == key:
+            set_user_state(user_id, UserState.WAITING_FOR_PATH)
+    await update.message.reply_text(f"🗑 Closed {target.name}. Send a path or /project <name> to continue.")
+
+async def cmd_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await admit(update, "command"): return
+    user_id = update.effective_user.id
+    job = job_queue.get(_job_arg(context))
+    if not job or job.user_id != user_id:
+        await update.message.reply_text("Usage: /cancel <job id> (see /queue)")
+        return
+    if job_queue.cancel(job.id):
+        await update.message.reply_text(f"🛑 Cancelling job #{job.id}...")
+    else:
+        await update.message.reply_text(f"Job #{job.id} is already {job.state.value}.")
+
+# ==============================================================================
+# PERSISTENCE
+# ==============================================================================
+store: Optional[StateStore] = None
+interrupted_jobs = []  # [(id, user_id, project, text, state)] left over by the previous run
+
+def _persist_session(session):
+    store.save_session(normalize_path(session.project_path), session.project_path, session.hwnd, session.last_used)
+
+def _persist_job(job: Job):
+    store.save_job(job.id, job.user_id, job.project, job.text, job.state.value,
+                   job.created, job.started, job.finished, job.error)
+
+def restore_state():
+    """
+    Warm restart: reload user states and sessions from STATE_DB, re-bind each
+    session to a window that is still open (a stored handle is kept only if
+    its title still names the project), and collect interrupted jobs.
+    """
+    global store, interrupted_jobs
+    if not SETTINGS["STATE_DB"] or store is not None: return
+    start = time.perf_counter()
+    try:
+        path = CONFIG_DIR / SETTINGS["STATE_DB"]  # an absolute STATE_DB replaces CONFIG_DIR
+        path.parent.mkdir(parents=True, exist_ok=True)
+        store = StateStore(path)
+    except Exception as e:
+        log.warning(f"State store disabled: {e}")
+        return
+
+    for user_id, state, path in store.load_users():
+        try:
+            user_states[user_id] = {"state": UserState(state), "path": path}
+        except ValueError:
+            continue
+
+    sessions = controller.sessions
+    for project_path, hwnd, last_used in store.load_sessions():
+        sessions.register(project_path, hwnd).last_used = last_used
+    titles = dict(sessions.windows(refresh=True))
+    for session in sessions.list():
+        if session.hwnd and not title_names(titles.get(session.hwnd, ""), session.project_path):
+            session.hwnd = None  # closed, or the handle now belongs to another window
+        sessions.resolve(session)
+
+    job_queue.resume_ids(store.last_job_id())
+    interrupted_jobs = store.interrupted_jobs()
+    sessions.on_change = _persist_session
+    sessions.on_forget = store.forget_session
+    job_queue.on_change = _persist_job
+    for session in sessions.list(): _persist_session(session)
+
+    bound = sum(1 for s in sessions.list() if s.hwnd)
+    log.info(f"State restored in {(time.perf_counter() - start) * 1000:.1f} ms: {len(user_states)} users, "
+             f"{bound}/{len(sessions.list())} sessions bound to open windows, {len(interrupted_jobs)} interrupted jobs")
+
+async def report_interrupted(app):
+    """post_init hook: tell each user which of their jobs the restart cut off."""
+    by_user = {}
+    for job_id, user_id, project, text, state in interrupted_jobs:
+        by_user.setdefault(user_id, []).append(f"#{job_id} ({state}) {text[:40]!r}")
+    for user_id, lines in by_user.items():
+        try:
+            # Private chat with the bot: chat id == user id
+            await app.bot.send_message(user_id, "⚠️ GhostSync restarted. Interrupted jobs (send them again to retry):\n"
+                                       + "\n".join(lines))
+        except Exception as e:
+            log.warning(f"Could not report interrupted jobs to {user_id}: {e}")
+    interrupted_jobs.clear()
+
+# ==============================================================================
+# TRANSPORT
+# ==============================================================================
+started_at = time.time()  # reset by build_application; older messages are "pending"
+
+def application_builder(token: Optional[str] = None, base_url: Optional[str] = None):
+    """ApplicationBuilder with the Bot API pool, timeouts and update concurrency from SETTINGS."""
+    builder = (ApplicationBuilder().token(token or TELEGRAM_BOT_TOKEN)
+               .connection_pool_size(SETTINGS["HTTP_POOL_SIZE"])
+               .connect_timeout(SETTINGS["HTTP_CONNECT_TIMEOUT"])
+               .read_timeout(SETTINGS["HTTP_READ_TIMEOUT"])
+               .write_timeout(SETTINGS["HTTP_WRITE_TIMEOUT"])
+               .pool_timeout(SETTINGS["HTTP_POOL_TIMEOUT"])
+               .concurrent_updates(SETTINGS["CONCURRENT_UPDATES"] or False))
+    if base_url: builder = builder.base_url(base_url)  # local stand-in Bot API (benchmarks)
+    return builder
+
+def transport_options() -> tuple:
+    """
+    ("polling" | "webhook", kwargs shared by Application.run_* and Updater.start_*).
+    Webhook mode falls back to polling when it is not usable.
+    """
+    common = {"drop_pending_updates": SETTINGS["REPLAY_PENDING_SECONDS"] <= 0}
+    if SETTINGS["TRANSPORT"].lower() == "webhook":
+        if not SETTINGS["WEBHOOK_URL"]:
+            log.error("TRANSPORT=webhook needs WEBHOOK_URL; using polling")
+        elif importlib.util.find_spec("tornado") is None:
+            log.error("TRANSPORT=webhook needs: pip install \"python-telegram-bot[webhooks]\"; using polling")
+        else:
+            path = SETTINGS["WEBHOOK_PATH"].strip("/")
+            return "webhook", dict(common,
+                listen=SETTINGS["WEBHOOK_LISTEN"], port=SETTINGS["WEBHOOK_PORT"], url_path=path,
+                webhook_url=f"{SETTINGS['WEBHOOK_URL'].rstrip('/')}/{path}",
+                secret_token=SETTINGS["WEBHOOK_SECRET"] or secrets.token_urlsafe(32),
+                max_connections=max(SETTINGS["CONCURRENT_UPDATES"], 1))
+    return "polling", dict(common, timeout=SETTINGS["POLLING_TIMEOUT"])
+
+async def drop_stale_updates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Group -1: pending messages older than REPLAY_PENDING_SECONDS never reach a
+    handler. message.date has whole seconds, so it is compared with the
+    startup second (a message from that second is kept). A dropped button
+    press is still answered, or the client keeps spinning.
+    """
+    message = update.effective_message
+    if message is None or message.date is None: return
+    sent = message.date.timestamp()
+    if sent < int(started_at) and time.time() - sent > SETTINGS["REPLAY_PENDING_SECONDS"]:
+        log.info(f"Dropped pending update {update.update_id} ({time.time() - sent:.0f}s old)")
+        if update.callback_query:
+            try:
+                await update.callback_query.answer("Expired: the bridge restarted.")
+            except TelegramError as e:
+                log.debug(f"Could not answer dropped callback: {e}")
+        raise ApplicationHandlerStop
+
+def register_handlers(app):
+    app.add_handler(TypeHandler(Update, drop_stale_updates), group=-1)
+    app.add_handler(CommandHandler("start", cmd_start))
+    app.add_handler(CommandHandler("queue", cmd_queue))
+    app.add_handler(CommandHandler("status", cmd_status))
+    app.add_handler(CommandHandler("cancel", cmd_cancel))
+    app.add_handler(CommandHandler("live", cmd_live))
+    app.add_handler(CommandHandler("tunnels", cmd_tunnels))
+    app.add_handler(CommandHandler("stats", cmd_stats))
+    app.add_handler(CommandHandler("project", cmd_project))
+    app.add_handler(CallbackQueryHandler(on_live_stop, pattern="^live:stop$"))
+    # block=False: a running prompt must not hold up /start or other users' messages
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message, block=False))
+
+# ==============================================================================
+# STARTUP
+# ==============================================================================
+_init_lock = threading.Lock()
+_initialized = False
+
+def init():
+    """
+    Explicit, idempotent startup: .env, log pipeline, heavy imports, Windows
+    API, then the tunnel pool, detector and controller singletons, then the
+    persisted state of the previous run.
+    """
+    global _initialized, tunnel, detector, controller, encoder, media
+    with _init_lock:
+        if _initialized: return
+        load_config()
+        setup_logging()
+        import_dependencies()
+        bind_windows_api()
+        tunnel = SecureTunnel(idle_timeout=TUNNEL_TIMEOUT_MINUTES * 60)
+        detector = AcceptDenyDetector()
+        encoder = AdaptiveEncoder(
+            max_side=SETTINGS["PHOTO_MAX_SIDE"], budget=SETTINGS["ENCODE_BYTE_BUDGET"],
+            target_ms=SETTINGS["ENCODE_TARGET_MS"], formats=SETTINGS["ENCODE_FORMATS"].replace(" ", "").split(","),
+            quality=SETTINGS["PHOTO_JPEG_QUALITY"], live_max_side=SETTINGS["LIVE_MAX_SIDE"],
+            live_budget=SETTINGS["LIVE_BYTE_BUDGET"], live_target_ms=SETTINGS["LIVE_TARGET_MS"])
+        media = MediaSender(encoder)
+        controller = AntigravityController()
+        controller.track_windows()
+        restore_state()
+        metrics.gauge("queue_depth", job_queue.depth, "Prompt jobs waiting to run.")
+        metrics.gauge("tunnels_open", lambda: len(tunnel.processes), "Cloudflare tunnels in the pool.")
+        _initialized = True
+
+def start_metrics_server():
+    global metrics_server
+    if SETTINGS["METRICS_PORT"] and metrics_server is None:
+        server = MetricsServer(metrics, SETTINGS["METRICS_PORT"])
+        if server.start(): metrics_server = server
+
+def build_application(token: Optional[str] = None):
+    """App factory: a telegram Application with every GhostSync handler registered."""
+    global started_at
+    init()
+    started_at = time.time()
+    app = application_builder(token).post_init(report_interrupted).build()
+    register_handlers(app)
+    return app
+
 def main():
+    init()
     log.info("--- BOT MAIN STARTED ---")
     if not TELEGRAM_BOT_TOKEN: 
         log.error("CRITICAL: No Telegram Token Found!")
         return
+    start_metrics_server()
 
     # Force new event loop for this thread
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     
     log.info("Building Application...")
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
-    app.add_handler(CommandHandler("start", cmd_start))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    app = build_application()
     
-    log.info("Starting Polling...")
-    app.run_polling(drop_pending_updates=True)
+    mode, options = transport_options()
+    if mode == "webhook":
+        log.info(f"Starting webhook listener on {options['listen']}:{options['port']}...")
+        app.run_webhook(**options)
+    else:
+        log.info("Starting Polling...")
+        app.run_polling(**options)
 
 if __name__ == "__main__":
     main()
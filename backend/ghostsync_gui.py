@@ -21,22 +21,60 @@ ctk.set_default_color_theme("blue")
 # Import backend (New)
 import ghostsync_core as ghostsync
 
-class TextHandler(logging.Handler):
-    def __init__(self, text_widget):
-        logging.Handler.__init__(self)
-        self.text_widget = text_widget
+from ghostsync_logging import BufferHandler, LogBuffer, matches
+
+log = logging.getLogger("GhostSync")
+
+LOG_FLUSH_MS = 100  # pending log lines are written to the panes in one insert per tick
+LOG_LEVELS = {"ALL": logging.NOTSET, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR}
+
+class LogView:
+    """
+    A CTkTextbox fed from a LogBuffer.
 
-    def emit(self, record):
-        msg = self.format(record)
-        def append():
-            self.text_widget.configure(state='normal')
-            self.text_widget.insert("end", msg + '\n')
-            self.text_widget.configure(state='disabled')
-            self.text_widget.see("end")
+    Records land in the buffer (off the Tk thread); every LOG_FLUSH_MS the
+    pending lines are inserted in one call and the widget is trimmed to the
+    buffer's max_lines, so a 24/7 session never grows the pane.
+    """
+
+    def __init__(self, text_widget, formatter, max_lines):
+        self.text_widget = text_widget
+        self.buffer = LogBuffer(max_lines)
+        self.handler = BufferHandler(self.buffer)
+        self.handler.setFormatter(formatter)
+        self.min_level = logging.NOTSET
+        self.query = ""
+        self._flush()
+
+    def _flush(self):
+        batch = [text for levelno, text in self.buffer.drain()
+                 if matches(levelno, text, self.min_level, self.query)]
+        if batch: self._write(batch)
         try:
-            self.text_widget.after(0, append)
-        except:
-            pass
+            self.text_widget.after(LOG_FLUSH_MS, self._flush)
+        except Exception:
+            pass  # widget destroyed
+
+    def _write(self, lines, replace=False):
+        w = self.text_widget
+        w.configure(state='normal')
+        if replace: w.delete("1.0", "end")
+        if lines: w.insert("end", "\n".join(lines) + "\n")
+        excess = int(w.index("end-1c").split(".")[0]) - 1 - self.buffer.max_lines
+        if excess > 0: w.delete("1.0", f"{excess + 1}.0")
+        w.configure(state='disabled')
+        w.see("end")
+
+    def set_filter(self, min_level=None, query=None):
+        """Re-render from the in-memory buffer (never re-reads ghostsync.log)."""
+        if min_level is not None: self.min_level = min_level
+        if query is not None: self.query = query.strip()
+        self.buffer.drain()  # already part of the selection below
+        self._write(self.buffer.select(self.min_level, self.query), replace=True)
+
+    def clear(self):
+        self.buffer.clear()
+        self._write([], replace=True)
 
 class GhostSyncApp(ctk.CTk):
     def __init__(self):
@@ -210,6 +248,20 @@ class GhostSyncApp(ctk.CTk):
             fg_color="transparent", border_width=1, text_color=("gray20", "gray80")
         ).pack(side="right")
 
+        # Filtering runs over the in-memory ring buffer
+        self.log_level_menu = ctk.CTkOptionMenu(
+            header, values=list(LOG_LEVELS), width=110, height=30,
+            command=lambda level: self.log_full.set_filter(min_level=LOG_LEVELS[level])
+        )
+        self.log_level_menu.pack(side="right", padx=10)
+
+        self.log_search_var = ctk.StringVar()
+        ctk.CTkEntry(
+            header, textvariable=self.log_search_var, width=220, height=30,
+            placeholder_text="Search log...", font=(FONT_MONO, 12), border_width=1
+        ).pack(side="right")
+        self.log_search_var.trace_add("write", lambda *_: self.log_full.set_filter(query=self.log_search_var.get()))
+
         self.full_log = ctk.CTkTextbox(
             self.frame_logs,
             font=(FONT_MONO, 13),
@@ -335,12 +387,12 @@ class GhostSyncApp(ctk.CTk):
         self.bot_thread.start()
 
     def _run_bot(self):
-        logging.info("Initializing Secure Bridge...")
+        log.info("Initializing Secure Bridge...")
         ghostsync.load_config()
         try:
             ghostsync.main()
         except Exception as e:
-            logging.error(f"Critical Error: {e}")
+            log.error(f"Critical Error: {e}")
             self.stop_bot()
 
     def stop_bot(self):
@@ -348,27 +400,32 @@ class GhostSyncApp(ctk.CTk):
         self.lbl_status.configure(text="OFFLINE", text_color="#ef4444")
         self.auto_connect_state = False
         self._save_state_only()
-        logging.info("Bridge Disconnected.")
+        log.info("Bridge Disconnected.")
         # Actual stop logic requires process restart for this simple architecture
 
     def clear_log(self):
-        self.full_log.configure(state='normal')
-        self.full_log.delete("1.0", "end")
-        self.full_log.configure(state='disabled')
+        self.log_full.clear()
 
     def log_setup(self):
         logger = logging.getLogger("GhostSync")
         logger.setLevel(logging.INFO)
         
+        # Panes are sinks of the core log pipeline: records arrive redacted,
+        # on the listener thread, and are buffered until the next Tk flush
+        only_ghostsync = logging.Filter("GhostSync")
+        ghostsync.load_config()  # just .env; the heavy init() runs when the bot starts
+        ghostsync.setup_logging()  # before anything logs, so no record bypasses the pipeline
+        max_lines = ghostsync.SETTINGS["LOG_VIEW_MAX_LINES"]
+        
         fmt_preview = logging.Formatter('%(asctime)s | %(message)s', datefmt='%H:%M:%S')
-        h1 = TextHandler(self.preview_log)
-        h1.setFormatter(fmt_preview)
-        logger.addHandler(h1)
+        self.log_preview = LogView(self.preview_log, fmt_preview, max_lines)
         
         fmt_full = logging.Formatter('%(asctime)s | %(levelname)-7s | %(message)s')
-        h2 = TextHandler(self.full_log)
-        h2.setFormatter(fmt_full)
-        logger.addHandler(h2)
+        self.log_full = LogView(self.full_log, fmt_full, max_lines)
+        
+        for view in (self.log_preview, self.log_full):
+            view.handler.addFilter(only_ghostsync)
+            ghostsync.log_pipeline.add_sink(view.handler)
 
     def load_config(self):
         f = Path("ghostsync.env") if Path("ghostsync.env").exists() else self.config_file
@@ -399,10 +456,10 @@ class GhostSyncApp(ctk.CTk):
             exe = sys.executable if getattr(sys, 'frozen', False) else os.path.abspath("ghostsync_gui.py")
             cmd = f'"{exe}"' if getattr(sys, 'frozen', False) else f'"{sys.executable}" "{exe}"'
             self.startup_script.write_text(f'Set WshShell = CreateObject("WScript.Shell")\nWshShell.Run {cmd}, 0')
-            logging.info("Auto-Start Enabled")
+            log.info("Auto-Start Enabled")
         else:
             if self.startup_script.exists(): self.startup_script.unlink()
-            logging.info("Auto-Start Disabled")
+            log.info("Auto-Start Disabled")
 
 if __name__ == "__main__":
     app = GhostSyncApp()
@@ -0,0 +1,186 @@
+"""
+GhostSync logging - redacted, queue-based log pipeline.
+
+Callers only pay for putting a record on a queue; formatting, redaction and
+all sink I/O (log file, console, GUI panes) happen on one listener thread.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+from collections import deque
+
+# ==============================================================================
+# REDACTION
+# ==============================================================================
+# One precompiled alternation instead of one re.sub per pattern
+# (the leading lookahead lets the engine skip positions that can't start a match)
+SENSITIVE_PATTERN = re.compile(
+    r'(?=[tpab])(?:'
+    r'(?P<token>token=[\w-]+)'
+    r'|(?P<password>password["\']?\s*[:=]\s*["\']?\w+)'
+    r'|(?P<api_key>api[_-]?key["\']?\s*[:=]\s*["\']?\w+)'
+    r'|(?P<bot>bot\d+:[\w-]+))',  # Bot API URLs embed the token (httpx logs them)
+    re.IGNORECASE,
+)
+REPLACEMENTS = {
+    "token": "token=***",
+    "password": "password=***",
+    "api_key": "api_key=***",
+    "bot": "bot***",
+}
+
+
+def _replace(match: re.Match) -> str:
+    return REPLACEMENTS[match.lastgroup]
+
+
+def sanitize(text: str) -> str:
+    low = text.lower()
+    # Most records contain no keyword at all: skip the regex entirely
+    if "token" not in low and "password" not in low and "api" not in low and "bot" not in low:
+        return text
+    return SENSITIVE_PATTERN.sub(_replace, text)
+
+
+class SanitizingFormatter(logging.Formatter):
+    """Formatter that redacts the final text; for sinks used outside the pipeline."""
+
+    def format(self, record):
+        return sanitize(super().format(record))
+
+# ==============================================================================
+# QUEUE PIPELINE
+# ==============================================================================
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """Only merges args into msg on the calling thread; everything else is deferred."""
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class _SanitizingListener(logging.handlers.QueueListener):
+    """Redacts each record once, before it fans out, so every sink sees the same text."""
+
+    _exc_formatter = logging.Formatter()
+
+    def handle(self, record):
+        record.msg = sanitize(str(record.msg))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = sanitize(self._exc_formatter.formatException(record.exc_info))
+        super().handle(record)
+
+
+class LogPipeline:
+    """
+    Installs a QueueHandler on a logger and drains it on a listener thread.
+
+    Sinks (FileHandler, StreamHandler, GUI handlers) are added to the
+    listener, never to the logger, so they all run off the logging thread
+    and all receive redacted records.
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.listener = _SanitizingListener(self.queue, respect_handler_level=True)
+        self.handler = _EnqueueHandler(self.queue)
+        self.installed = False
+        self._started = False
+
+    def install(self, sinks=(), logger: logging.Logger = None, level: int = logging.INFO):
+        """
+        Idempotent. Any other handler on the logger (e.g. the stderr
+        StreamHandler basicConfig adds when something logged through the root
+        logger first) is removed: it would print every record a second time,
+        synchronously and unredacted.
+        """
+        logger = logger or logging.getLogger()
+        logger.setLevel(level)
+        for other in [h for h in logger.handlers if h is not self.handler]:
+            logger.removeHandler(other)
+        if self.handler not in logger.handlers:
+            logger.addHandler(self.handler)
+        self.installed = True
+        for sink in sinks:
+            self.add_sink(sink)
+        if not self._started:
+            self.listener.start()
+            self._started = True
+            atexit.register(self.stop)
+
+    def add_sink(self, handler: logging.Handler):
+        if handler not in self.listener.handlers:
+            self.listener.handlers = self.listener.handlers + (handler,)
+
+    def remove_sink(self, handler: logging.Handler):
+        self.listener.handlers = tuple(h for h in self.listener.handlers if h is not handler)
+
+    def stop(self):
+        """Flush everything still queued and stop the listener thread."""
+        if self._started:
+            self._started = False
+            self.listener.stop()
+
+# ==============================================================================
+# LOG VIEW BUFFER
+# ==============================================================================
+class LogBuffer:
+    """
+    Ring buffer of formatted lines behind a GUI log pane.
+
+    Sinks append from the listener thread; the GUI drains `pending` on a
+    timer and inserts the whole batch at once. Only the last `max_lines`
+    lines are kept, and filtering/search run over them in memory.
+    """
+
+    def __init__(self, max_lines: int = 2000):
+        self.max_lines = max(1, max_lines)
+        self.lines = deque(maxlen=self.max_lines)    # (levelno, text)
+        self.pending = deque(maxlen=self.max_lines)  # appended since the last drain
+        self.lock = threading.Lock()
+
+    def append(self, levelno: int, text: str):
+        with self.lock:
+            self.lines.append((levelno, text))
+            self.pending.append((levelno, text))
+
+    def drain(self) -> list:
+        with self.lock:
+            batch = list(self.pending)
+            self.pending.clear()
+        return batch
+
+    def select(self, min_level: int = logging.NOTSET, query: str = "") -> list:
+        """Buffered lines at or above `min_level` containing `query` (case-insensitive)."""
+        with self.lock:
+            lines = list(self.lines)
+        return [text for levelno, text in lines if matches(levelno, text, min_level, query)]
+
+    def clear(self):
+        with self.lock:
+            self.lines.clear()
+            self.pending.clear()
+
+
+def matches(levelno: int, text: str, min_level: int = logging.NOTSET, query: str = "") -> bool:
+    return levelno >= min_level and (not query or query.lower() in text.lower())
+
+
+class BufferHandler(logging.Handler):
+    """Pipeline sink that formats into a LogBuffer; never touches a widget."""
+
+    def __init__(self, buffer: LogBuffer):
+        super().__init__()
+        self.buffer = buffer
+
+    def emit(self, record):
+        try:
+            self.buffer.append(record.levelno, self.format(record))
+        except Exception:
+            self.handleError(record)
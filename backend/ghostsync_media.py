@@ -0,0 +1,277 @@
+"""
+GhostSync media - outbound screenshots for Telegram.
+
+Frames are downscaled to the size Telegram keeps for bot photos and
+encoded in memory by AdaptiveEncoder (format and quality chosen per frame
+to fit a byte budget and a latency target). Every upload's file_id is
+remembered under the frame's signature, so a frame that is identical or
+visually indistinguishable from one already sent is re-sent by file_id
+without uploading anything.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+from PIL import Image
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+log = logging.getLogger("GhostSync")
+
+# Largest PhotoSize Telegram keeps for photos sent by bots
+TELEGRAM_PHOTO_SIDE = 1280
+
+# ==============================================================================
+# FILE_ID CACHE
+# ==============================================================================
+class FrameCache:
+    """
+    LRU of file_ids keyed by a grayscale `grid` signature of the frame.
+
+    Exact signature matches are a dict hit. Otherwise the newest entries are
+    scanned for a signature whose every cell is within `pixel_delta` grey
+    levels (one cell is ~10x10 px at the default grid, finer than a line of
+    text); pixel_delta < 0 disables near matches.
+    """
+
+    def __init__(self, capacity: int = 64, grid=(192, 108), pixel_delta: int = 2):
+        self.capacity = capacity
+        self.grid = grid
+        self.pixel_delta = pixel_delta
+        self.entries = OrderedDict()  # digest -> (signature, file_id)
+
+    def signature(self, frame: Image.Image) -> tuple:
+        thumb = frame.resize(self.grid, Image.BOX, reducing_gap=3.0).convert("L")
+        sig = np.asarray(thumb, dtype=np.int16)
+        return hashlib.blake2b(sig.tobytes(), digest_size=16).hexdigest(), sig
+
+    def lookup(self, digest: str, sig: np.ndarray) -> Optional[str]:
+        entry = self.entries.get(digest)
+        if entry is None and self.pixel_delta >= 0:
+            for key, (other, _) in reversed(self.entries.items()):
+                if int(np.abs(other - sig).max()) <= self.pixel_delta:
+                    digest, entry = key, self.entries[key]
+                    break
+        if entry is None: return None
+        self.entries.move_to_end(digest)
+        return entry[1]
+
+    def store(self, digest: str, sig: np.ndarray, file_id: str):
+        self.entries[digest] = (sig, file_id)
+        self.entries.move_to_end(digest)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def forget(self, file_id: str):
+        for key in [k for k, (_, f) in self.entries.items() if f == file_id]:
+            del self.entries[key]
+
+# ==============================================================================
+# ENCODER
+# ==============================================================================
+FORMAT_EXT = {"png8": "png", "jpeg": "jpg", "webp": "webp"}
+PALETTE_MAX_COLORS = 4096  # above this the frame is photo-like and palette PNG bands
+MIN_QUALITY = 35
+
+
+def fit(image: Image.Image, max_side: int, fast: bool = False) -> Image.Image:
+    """Downscale so the long side is at most max_side (fast: integer box reduce)."""
+    longest = max(image.size)
+    if longest <= max_side: return image
+    if fast: return image.reduce(math.ceil(longest / max_side))
+    image = image.copy()
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def save(image: Image.Image, fmt: str, quality: int = 85) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "png8":
+        image.quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE).save(buf, format="PNG")
+    elif fmt == "webp":
+        image.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+class AdaptiveEncoder:
+    """
+    Picks format and quality per frame to land under a byte budget within a
+    latency target. Results are dicts: {"data", "format", "quality", "size", "ms"}.
+
+    quality mode (prompt results, saved screenshots): palette PNG first when
+    the frame has few colours (crisp UI text, usually the smallest), then the
+    lossy formats, starting from the quality the previous frame settled on and
+    stepping down until the budget fits or the time target is spent; the
+    smallest attempt wins if nothing fits.
+    fast mode (live frames): one JPEG encode after an integer box reduce;
+    quality and size are nudged after each frame to stay within budget / time.
+    All encoding runs on its own small thread pool, never the automation thread.
+    """
+
+    def __init__(self, max_side: int = TELEGRAM_PHOTO_SIDE, budget: int = 350_000, target_ms: float = 250,
+                 formats=("png8", "jpeg"), quality: int = 85,
+                 live_max_side: int = 1280, live_budget: int = 120_000, live_target_ms: float = 60,
+                 workers: int = 2):
+        self.max_side = max_side
+        self.budget = budget
+        self.target_ms = target_ms
+        self.formats = [f for f in formats if f in FORMAT_EXT]
+        unknown = [f for f in formats if f not in FORMAT_EXT]
+        if unknown: log.warning(f"Ignoring unknown encode formats {unknown} (known: {', '.join(FORMAT_EXT)})")
+        if not self.formats:
+            log.warning("No usable encode format configured; using jpeg")
+            self.formats = ["jpeg"]
+        self.max_quality = quality
+        self.quality = {f: quality for f in self.formats}  # where the next frame starts
+        self.live_max_side = live_max_side
+        self.live_budget = live_budget
+        self.live_target_ms = live_target_ms
+        self.live_side = live_max_side
+        self.live_quality = min(quality, 70)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="GhostSync-Encode")
+        self._lock = threading.Lock()
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def encode_async(self, frame: Image.Image, mode: str = "quality") -> dict:
+        return await self.run(self.encode, frame, mode)
+
+    def encode(self, frame: Image.Image, mode: str = "quality") -> dict:
+        return self._fast(frame) if mode == "fast" else self._best(frame)
+
+    def _best(self, frame: Image.Image) -> dict:
+        start = time.perf_counter()
+        elapsed = lambda: (time.perf_counter() - start) * 1000
+        image = fit(frame.convert("RGB"), self.max_side)
+        best = None
+        for fmt in self.formats:
+            if fmt == "png8":
+                if image.getcolors(PALETTE_MAX_COLORS) is None: continue
+                attempts = [0]
+            else:
+                with self._lock:
+                    q = self.quality[fmt]
+                attempts = range(q, MIN_QUALITY - 1, -10)
+            for q in attempts:
+                data = save(image, fmt, q)
+                if best is None or len(data) < len(best["data"]):
+                    best = {"data": data, "format": fmt, "quality": q}
+                if len(data) <= self.budget:
+                    if fmt != "png8":
+                        with self._lock:  # start here next time; creep back up when well under
+                            self.quality[fmt] = min(self.max_quality, q + 5 if len(data) < self.budget * 0.6 else q)
+                    return dict(best, size=len(data), ms=elapsed())  # earlier attempts were all larger
+                if elapsed() > self.target_ms: break
+            if elapsed() > self.target_ms: break
+        if best is None:  # e.g. png8 only and the frame has too many colours
+            image = fit(image, self.max_side // 2, fast=True)
+            best = {"data": save(image, "jpeg", MIN_QUALITY), "format": "jpeg", "quality": MIN_QUALITY}
+        return dict(best, size=len(best["data"]), ms=elapsed())
+
+    def _fast(self, frame: Image.Image) -> dict:
+        start = time.perf_counter()
+        with self._lock:
+            side, q = self.live_side, self.live_quality
+        image = fit(frame.convert("RGB"), side, fast=True)
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=q)
+        data = buf.getvalue()
+        ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            if len(data) > self.live_budget: self.live_quality = max(MIN_QUALITY, q - 10)
+            elif len(data) < self.live_budget * 0.6: self.live_quality = min(self.max_quality, 70, q + 5)
+            if ms > self.live_target_ms: self.live_side = max(640, int(side * 0.85))
+            elif ms < self.live_target_ms * 0.5: self.live_side = min(self.live_max_side, int(side / 0.85) + 1)
+        return {"data": data, "format": "jpeg", "quality": q, "size": len(data), "ms": ms}
+
+# ==============================================================================
+# SENDER
+# ==============================================================================
+class MediaSender:
+    """
+    send_photo / send_pair wrap the Bot API calls: reuse a cached file_id when
+    the frame was sent before, else upload the encoder's bytes (quality mode)
+    and cache the returned file_id. CPU work (signature, encode) runs on the
+    encoder's threads, off the event loop.
+    """
+
+    def __init__(self, encoder: Optional[AdaptiveEncoder] = None, cache: Optional[FrameCache] = None):
+        self.encoder = encoder or AdaptiveEncoder()
+        self.cache = cache or FrameCache()
+        self.uploads = 0
+        self.reused = 0
+        self.bytes_sent = 0
+
+    async def _prepare(self, frame: Image.Image, reuse: bool = True) -> tuple:
+        """(digest, signature, cached file_id or JPEG bytes)"""
+        digest, sig = await self.encoder.run(self.cache.signature, frame)
+        file_id = self.cache.lookup(digest, sig) if reuse else None
+        if file_id: return digest, sig, file_id
+        return digest, sig, (await self.encoder.encode_async(frame))["data"]
+
+    def _sent(self, digest, sig, payload, photo_sizes):
+        if isinstance(payload, bytes):
+            self.uploads += 1
+            self.bytes_sent += len(payload)
+            if photo_sizes: self.cache.store(digest, sig, photo_sizes[-1].file_id)
+        else:
+            self.reused += 1
+
+    def _rejected(self, prepared: list, error: Exception) -> bool:
+        """A cached file_id was refused (e.g. bot token changed): drop it so the retry uploads."""
+        stale = [payload for _, _, payload in prepared if not isinstance(payload, bytes)]
+        if not stale: return False
+        log.warning(f"Cached photo rejected ({error}); re-uploading")
+        for file_id in stale: self.cache.forget(file_id)
+        return True
+
+    async def send_photo(self, send: Callable[..., Awaitable], frame: Image.Image, **kwargs):
+        """
+        `send(photo, **kwargs)` is e.g. message.reply_photo or
+        functools.partial(bot.send_photo, chat_id).
+        """
+        prepared = await self._prepare(frame)
+        try:
+            msg = await send(prepared[2], **kwargs)
+        except BadRequest as e:
+            if not self._rejected([prepared], e): raise
+            prepared = await self._prepare(frame, reuse=False)
+            msg = await send(prepared[2], **kwargs)
+        self._sent(*prepared, getattr(msg, "photo", None))
+        return msg
+
+    async def send_pair(self, bot, chat_id: int, before: Image.Image, after: Image.Image,
+                        caption: Optional[str] = None, **kwargs) -> list:
+        """Before / after frames as one album (one send_media_group call); caption on the first."""
+        async def send(prepared):
+            media = [InputMediaPhoto(payload, caption=caption if i == 0 else None)
+                     for i, (_, _, payload) in enumerate(prepared)]
+            return await bot.send_media_group(chat_id, media, **kwargs)
+
+        prepared = [await self._prepare(frame) for frame in (before, after)]
+        try:
+            messages = await send(prepared)
+        except BadRequest as e:
+            if not self._rejected(prepared, e): raise
+            prepared = [await self._prepare(frame, reuse=False) for frame in (before, after)]
+            messages = await send(prepared)
+        for entry, msg in zip(prepared, messages):
+            self._sent(*entry, msg.photo)
+        return messages
+
+    def stats(self) -> dict:
+        return {"uploads": self.uploads, "reused": self.reused, "bytes_sent": self.bytes_sent,
+                "cached": len(self.cache.entries)}
+
@@ -0,0 +1,169 @@
+"""
+GhostSync metrics - timing spans, in-memory histograms, Prometheus text.
+
+Pure stdlib: histograms are fixed-bucket counters (constant memory however
+long the bot runs) and the optional HTTP endpoint only binds to localhost.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+log = logging.getLogger("GhostSync")
+
+# Seconds; covers a 50 ms click up to a 5 minute IDE run
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# ==============================================================================
+# HISTOGRAM
+# ==============================================================================
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with min / max."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th value."""
+        if not self.count: return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+# ==============================================================================
+# REGISTRY
+# ==============================================================================
+class Metrics:
+    """
+    Named stage histograms plus gauges read on demand.
+
+    `span(stage)` times a block (sync or inside a coroutine) and records it
+    even when the block raises. Stages are listed in first-seen order, which
+    for the prompt pipeline is execution order.
+    """
+
+    def __init__(self, prefix: str = "ghostsync", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.default_buckets = buckets
+        self.histograms = {}  # stage -> Histogram
+        self.gauges = {}      # name -> (help, fn returning a number)
+        self.lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram(self.default_buckets)
+            hist.observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def gauge(self, name: str, fn: Callable[[], float], help_text: str = ""):
+        self.gauges[name] = (help_text, fn)
+
+    def summary(self) -> list:
+        """[(stage, count, mean, p50, p95, max)] for every stage seen."""
+        with self.lock:
+            return [(stage, h.count, h.mean, h.quantile(0.5), h.quantile(0.95), h.max or 0.0)
+                    for stage, h in self.histograms.items()]
+
+    def render_prometheus(self) -> str:
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Wall time per prompt pipeline stage.", f"# TYPE {name} histogram"]
+        with self.lock:
+            for stage, h in self.histograms.items():
+                cumulative = 0
+                bounds = [f"{b:g}" for b in h.buckets] + ["+Inf"]
+                for bound, n in zip(bounds, h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+        for gauge, (help_text, fn) in self.gauges.items():
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            lines.append(f"# HELP {self.prefix}_{gauge} {help_text}".rstrip())
+            lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+            lines.append(f"{self.prefix}_{gauge} {value:g}")
+        return "\n".join(lines) + "\n"
+
+# ==============================================================================
+# LOCAL HTTP ENDPOINT
+# ==============================================================================
+class MetricsServer:
+    """Serves GET /metrics in Prometheus text format on a daemon thread (localhost only)."""
+
+    def __init__(self, metrics: Metrics, port: int, host: str = "127.0.0.1"):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.httpd = None
+
+    def start(self) -> bool:
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # scrapes would flood the log
+
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            log.warning(f"Metrics endpoint disabled: cannot bind {self.host}:{self.port} ({e})")
+            return False
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, name="GhostSync-Metrics", daemon=True).start()
+        log.info(f"Metrics on http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,163 @@
+"""
+GhostSync reply capture - only the text the IDE produced since the last prompt.
+
+Sources are pluggable (a file tail over an IDE log / export directory, the
+clipboard as fallback); each remembers where the previous capture ended, so
+the reply sent to Telegram scales with the new answer, not the whole history.
+No GUI or Windows dependencies: sources take plain callables and paths.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+log = logging.getLogger("GhostSync")
+
+# ==============================================================================
+# FINGERPRINT
+# ==============================================================================
+class ReplyTracker:
+    """
+    Diffs successive full-text captures by a fingerprint of the previous one.
+
+    The fingerprint is the last `anchor_chars` characters of the previous
+    capture (nothing else is kept). The new portion is whatever follows the last occurrence
+    of that anchor; with no anchor (first capture, chat cleared) the last
+    `max_chars` characters are returned instead of the whole history.
+    """
+
+    def __init__(self, anchor_chars: int = 256, max_chars: int = 4000):
+        self.anchor_chars = anchor_chars
+        self.max_chars = max_chars
+        self.anchor = ""
+
+    def extract(self, text: str) -> str:
+        text = text or ""
+        new = self._new_portion(text)
+        if text:
+            self.anchor = text[-self.anchor_chars:]
+        return new
+
+    def _new_portion(self, text: str) -> str:
+        if not self.anchor: return text[-self.max_chars:]
+        if text.endswith(self.anchor): return ""  # nothing new since the last capture
+        at = text.rfind(self.anchor)
+        if at < 0: return text[-self.max_chars:]  # history replaced (new chat / new file)
+        return text[at + len(self.anchor):][-self.max_chars:]
+
+    def reset(self):
+        self.anchor = ""
+
+# ==============================================================================
+# SOURCES
+# ==============================================================================
+class ClipboardSource:
+    """Fallback: `copy()` returns the full panel text (Ctrl+A / Ctrl+C), diffed by fingerprint."""
+
+    name = "clipboard"
+
+    def __init__(self, copy: Callable[[], Optional[str]], tracker: Optional[ReplyTracker] = None):
+        self.copy = copy
+        self.tracker = tracker or ReplyTracker()
+
+    def mark(self):
+        pass  # the fingerprint of the last capture is the mark
+
+    def read(self) -> str:
+        return self.tracker.extract(self.copy() or "").strip()
+
+
+class FileTailSource:
+    """
+    Tails the newest file matching `patterns` in `directory` (IDE log or
+    conversation export). mark() records the byte offset before a prompt and
+    read() returns only what was appended since. A file that was rewritten
+    instead of appended to (smaller than the mark, or a different file) is
+    read whole and diffed by fingerprint.
+    """
+
+    name = "file"
+
+    def __init__(self, directory: str, patterns: str = "*.md;*.txt;*.log", encoding: str = "utf-8",
+                 tracker: Optional[ReplyTracker] = None):
+        self.directory = Path(directory)
+        self.patterns = [p.strip() for p in patterns.split(";") if p.strip()]
+        self.encoding = encoding
+        self.tracker = tracker or ReplyTracker()
+        self.path = None
+        self.offset = 0
+
+    def newest(self) -> Optional[Path]:
+        best, best_mtime = None, -1.0
+        for pattern in self.patterns:
+            for path in self.directory.glob(pattern):
+                try:
+                    mtime = path.stat().st_mtime
+                except OSError:
+                    continue
+                if mtime > best_mtime: best, best_mtime = path, mtime
+        return best
+
+    def mark(self):
+        self.path = self.newest()
+        try:
+            self.offset = self.path.stat().st_size if self.path else 0
+        except OSError:
+            self.offset = 0
+
+    def read(self) -> str:
+        path = self.newest()
+        if path is None: return ""
+        try:
+            size = path.stat().st_size
+            with open(path, "rb") as f:
+                if path == self.path and size >= self.offset:
+                    f.seek(self.offset)  # appended: read only the new bytes
+                    new = f.read().decode(self.encoding, "replace")
+                    self.tracker.extract(new)  # keep the fingerprint at the end of the file
+                else:
+                    new = self.tracker.extract(f.read().decode(self.encoding, "replace"))
+                end = f.tell()  # what was consumed, including bytes appended after the stat
+        except OSError as e:
+            log.warning(f"Reply file unreadable ({path.name}): {e}")
+            return ""
+        self.path, self.offset = path, end
+        return new.strip()
+
+# ==============================================================================
+# EXTRACTOR
+# ==============================================================================
+class ReplyExtractor:
+    """Tries each source in order; the first one with new text wins."""
+
+    def __init__(self, sources: list):
+        self.sources = sources
+        self.last_source = None
+
+    @classmethod
+    def from_settings(cls, cfg: dict, copy: Callable[[], Optional[str]]) -> "ReplyExtractor":
+        sources = []
+        directory = cfg.get("REPLY_SOURCE_DIR")
+        if directory and os.path.isdir(directory):
+            sources.append(FileTailSource(directory, cfg.get("REPLY_FILE_PATTERNS", "*.md;*.txt;*.log")))
+        sources.append(ClipboardSource(copy))
+        return cls(sources)
+
+    def mark(self):
+        """Call right before submitting a prompt."""
+        for source in self.sources:
+            source.mark()
+
+    def read(self) -> str:
+        for source in self.sources:
+            try:
+                text = source.read()
+            except Exception as e:
+                log.warning(f"Reply source {source.name} failed: {e}")
+                continue
+            if text:
+                self.last_source = source.name
+                return text
+        self.last_source = None
+        return ""
@@ -0,0 +1,149 @@
+"""
+GhostSync sessions - which Antigravity window belongs to which project.
+
+Window enumeration and validity checks are injected, so the manager has no
+Windows dependency and can be driven by a fake window list.
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Callable, Optional
+
+# ==============================================================================
+# SESSION
+# ==============================================================================
+class Session:
+    """One project open in one Antigravity window."""
+
+    def __init__(self, project_path: str, hwnd: Optional[int] = None):
+        self.project_path = project_path
+        self.hwnd = hwnd
+        self.latest_stream_ss = None  # PIL image of the most recent wait-loop frame
+        self.created = time.time()
+        self.last_used = self.created
+        self._lock = None
+
+    @property
+    def name(self) -> str:
+        return folder_name(self.project_path) or self.project_path
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Serializes prompts per window (created lazily on the running loop)."""
+        if self._lock is None: self._lock = asyncio.Lock()
+        return self._lock
+
+# ==============================================================================
+# MANAGER
+# ==============================================================================
+def normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path.strip().strip('"')))
+
+
+def folder_name(path: str) -> str:
+    """Last path component, for either separator (window titles show the folder name)."""
+    parts = [p for p in re.split(r"[\\/]", path.strip().strip('"')) if p]
+    return parts[-1] if parts else ""
+
+
+# Window titles read "file - folder - Antigravity" (em dash on some builds)
+TITLE_SEPARATOR = re.compile(r"\s+[-\u2014\u2013]\s+")
+
+
+def title_names(title: str, path: str) -> bool:
+    """True if one " - " separated segment of the title is exactly the project folder."""
+    folder = folder_name(path).lower()
+    return bool(folder) and any(part.strip().lower() == folder for part in TITLE_SEPARATOR.split(title))
+
+
+class SessionManager:
+    """
+    Maps project paths to window handles.
+
+    `list_windows()` returns [(hwnd, title)] of the candidate windows and is
+    cached for `cache_ttl` seconds; `is_valid(hwnd)` is checked before a
+    stored handle is reused. A session whose window went away is re-bound to
+    an unclaimed window whose title names the project folder.
+    """
+
+    def __init__(self, list_windows: Callable[[], list], is_valid: Callable[[int], bool],
+                 cache_ttl: float = 2.0):
+        self.list_windows = list_windows
+        self.is_valid = is_valid
+        self.cache_ttl = cache_ttl
+        self.sessions = {}  # normalized path -> Session, in open order
+        self.on_change = None  # fn(session) after a session is added or re-bound (persistence)
+        self.on_forget = None  # fn(key) after a session is dropped
+        self._windows = []
+        self._windows_at = float("-inf")
+
+    def windows(self, refresh: bool = False) -> list:
+        now = time.monotonic()
+        if refresh or now - self._windows_at > self.cache_ttl:
+            self._windows = list(self.list_windows())
+            self._windows_at = now
+        return self._windows
+
+    def invalidate(self):
+        self._windows_at = float("-inf")
+
+    def get(self, project_path: Optional[str]) -> Optional[Session]:
+        if not project_path: return None
+        return self.sessions.get(normalize_path(project_path))
+
+    def default(self) -> Optional[Session]:
+        """The most recently used session (for callers that don't name a project)."""
+        return max(self.sessions.values(), key=lambda s: s.last_used, default=None)
+
+    def register(self, project_path: str, hwnd: Optional[int]) -> Session:
+        session = self.get(project_path)
+        if session is None:
+            session = self.sessions[normalize_path(project_path)] = Session(project_path, hwnd)
+        session.hwnd = hwnd
+        session.last_used = time.time()
+        self._changed(session)
+        return session
+
+    def forget(self, project_path: str) -> bool:
+        key = normalize_path(project_path)
+        if self.sessions.pop(key, None) is None: return False
+        if self.on_forget: self.on_forget(key)
+        return True
+
+    def _changed(self, session: Session):
+        if self.on_change: self.on_change(session)
+
+    def claimed(self, exclude: Optional[Session] = None) -> set:
+        return {s.hwnd for s in self.sessions.values() if s.hwnd and s is not exclude}
+
+    def unclaimed(self, refresh: bool = False) -> list:
+        taken = self.claimed()
+        return [(hwnd, title) for hwnd, title in self.windows(refresh) if hwnd not in taken]
+
+    def find_window(self, project_path: str, exclude: Optional[Session] = None,
+                    refresh: bool = False) -> Optional[int]:
+        """Unclaimed window whose title names the project folder (exact segment), else None."""
+        taken = self.claimed(exclude)
+        for hwnd, title in self.windows(refresh):
+            if hwnd not in taken and title_names(title, project_path):
+                return hwnd
+        return None
+
+    def resolve(self, session: Session) -> Optional[int]:
+        """
+        A valid window handle for the session, re-detecting it by title if
+        needed; None when no window names the project (never a guess).
+        """
+        if session.hwnd and self.is_valid(session.hwnd): return session.hwnd
+        hwnd = self.find_window(session.project_path, exclude=session)
+        if hwnd is None:
+            hwnd = self.find_window(session.project_path, exclude=session, refresh=True)
+        if hwnd != session.hwnd:
+            session.hwnd = hwnd
+            self._changed(session)
+        return hwnd
+
+    def list(self) -> list:
+        return list(self.sessions.values())
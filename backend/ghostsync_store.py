@@ -0,0 +1,127 @@
+"""
+GhostSync store - user state, project windows and job records in SQLite.
+
+Lets the bridge come back after a GUI restart or crash without /start:
+users keep their state and active project, sessions are re-bound to the
+windows that are still open, and jobs that were queued or running when
+the process died are reported as interrupted. Stdlib only (sqlite3);
+every write is one small autocommitted statement.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+log = logging.getLogger("GhostSync")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    state   TEXT NOT NULL,
+    path    TEXT,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    key          TEXT PRIMARY KEY,
+    project_path TEXT NOT NULL,
+    hwnd         INTEGER,
+    last_used    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id       INTEGER PRIMARY KEY,
+    user_id  INTEGER NOT NULL,
+    project  TEXT,
+    text     TEXT NOT NULL,
+    state    TEXT NOT NULL,
+    created  REAL NOT NULL,
+    started  REAL,
+    finished REAL,
+    error    TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+# Job states that mean "the process died before the job finished"
+OPEN_JOB_STATES = ("queued", "running")
+
+# ==============================================================================
+# STORE
+# ==============================================================================
+class StateStore:
+    """
+    One SQLite file (WAL, synchronous=NORMAL: a crash loses at most the last
+    write, never the file). Safe to call from the bot loop and the
+    automation thread.
+    """
+
+    def __init__(self, path: str, job_history: int = 200):
+        self.path = str(path)
+        self.job_history = job_history
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def _write(self, sql: str, args: tuple = ()):
+        try:
+            with self._lock:
+                self.db.execute(sql, args)
+        except sqlite3.Error as e:
+            log.warning(f"State store write failed: {e}")
+
+    def _read(self, sql: str, args: tuple = ()) -> list:
+        with self._lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    # ---- users ----
+    def save_user(self, user_id: int, state: str, path: Optional[str]):
+        self._write("INSERT OR REPLACE INTO users (user_id, state, path, updated) VALUES (?, ?, ?, ?)",
+                    (user_id, state, path, time.time()))
+
+    def load_users(self) -> list:
+        """[(user_id, state, path)]"""
+        return self._read("SELECT user_id, state, path FROM users")
+
+    # ---- sessions ----
+    def save_session(self, key: str, project_path: str, hwnd: Optional[int], last_used: float):
+        self._write("INSERT OR REPLACE INTO sessions (key, project_path, hwnd, last_used) VALUES (?, ?, ?, ?)",
+                    (key, project_path, hwnd, last_used))
+
+    def forget_session(self, key: str):
+        self._write("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def load_sessions(self) -> list:
+        """[(project_path, hwnd, last_used)], oldest first."""
+        return self._read("SELECT project_path, hwnd, last_used FROM sessions ORDER BY last_used")
+
+    # ---- jobs ----
+    def save_job(self, job_id: int, user_id: int, project: Optional[str], text: str, state: str,
+                 created: float, started: Optional[float], finished: Optional[float], error: Optional[str]):
+        self._write("INSERT OR REPLACE INTO jobs (id, user_id, project, text, state, created, started, finished, error)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, user_id, project, text, state, created, started, finished, error))
+        if finished and job_id % 50 == 0:
+            self._write("DELETE FROM jobs WHERE id <= ?", (job_id - self.job_history,))
+
+    def last_job_id(self) -> int:
+        return self._read("SELECT COALESCE(MAX(id), 0) FROM jobs")[0][0]
+
+    def interrupted_jobs(self, error: str = "interrupted by restart") -> list:
+        """
+        Jobs left queued / running by the previous process, marked failed.
+        Returns [(id, user_id, project, text, state)] as they were found.
+        """
+        marks = ",".join("?" * len(OPEN_JOB_STATES))
+        rows = self._read(f"SELECT id, user_id, project, text, state FROM jobs WHERE state IN ({marks}) ORDER BY id",
+                          OPEN_JOB_STATES)
+        if rows:
+            self._write(f"UPDATE jobs SET state = 'failed', finished = ?, error = ? WHERE state IN ({marks})",
+                        (time.time(), error) + OPEN_JOB_STATES)
+        return rows
@@ -0,0 +1,98 @@
+"""
+GhostSync timing helpers - polling cadence and readiness waits for the automation loop.
+
+No GUI or Windows dependencies; the clock can be injected for testing.
+"""
+
+import asyncio
+import inspect
+import time
+from typing import Callable, Optional
+
+# ==============================================================================
+# ADAPTIVE POLLER
+# ==============================================================================
+class AdaptivePoller:
+    """
+    Capture cadence for _wait_with_detection.
+
+    Polls at `min_interval` for the first `fast_seconds` after submit and
+    whenever the screen changes, then backs off by `backoff` per idle frame
+    up to `max_interval`. Prompt detection runs on the first frame after a
+    change (at most every `detect_min_interval`) and otherwise every
+    `detect_max_interval`, so its cadence follows the observed change rate.
+    """
+
+    def __init__(self, min_interval: float = 0.25, max_interval: float = 2.0, backoff: float = 1.5,
+                 fast_seconds: float = 3.0, detect_min_interval: float = 0.5,
+                 detect_max_interval: float = 4.0, now: Optional[float] = None):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.fast_seconds = fast_seconds
+        self.detect_min_interval = detect_min_interval
+        self.detect_max_interval = detect_max_interval
+        self.reset(now)
+
+    @classmethod
+    def from_settings(cls, cfg: dict, now: Optional[float] = None) -> "AdaptivePoller":
+        return cls(
+            min_interval=cfg["POLL_MIN_INTERVAL"],
+            max_interval=cfg["POLL_MAX_INTERVAL"],
+            backoff=cfg["POLL_BACKOFF"],
+            fast_seconds=cfg["POLL_FAST_SECONDS"],
+            detect_min_interval=cfg["DETECT_MIN_INTERVAL"],
+            detect_max_interval=cfg["DETECT_MAX_INTERVAL"],
+            now=now,
+        )
+
+    def reset(self, now: Optional[float] = None):
+        """Back to the fast phase (after submit or after clicking a prompt)."""
+        now = time.time() if now is None else now
+        self.started = now
+        self.interval = self.min_interval
+        self.last_detect = float("-inf")
+        self.pending_change = True
+        self.frames = 0
+        self.changes = 0
+
+    def next_interval(self) -> float:
+        return self.interval
+
+    def record(self, changed: bool, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self.frames += 1
+        if changed:
+            self.changes += 1
+            self.pending_change = True
+            self.interval = self.min_interval
+        elif now - self.started >= self.fast_seconds:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def should_detect(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        since = now - self.last_detect
+        if (self.pending_change and since >= self.detect_min_interval) or since >= self.detect_max_interval:
+            self.last_detect = now
+            self.pending_change = False
+            return True
+        return False
+
+# ==============================================================================
+# READINESS WAITS
+# ==============================================================================
+async def wait_until(predicate: Callable, timeout: float, interval: float = 0.05) -> bool:
+    """
+    Poll `predicate` (plain function or coroutine function) until it returns
+    something truthy or `timeout` seconds pass. The first check is immediate,
+    so a condition that already holds costs no sleep. Returns whether it held.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if inspect.isawaitable(result): result = await result
+        if result: return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0: return False
+        await asyncio.sleep(min(interval, remaining))
+
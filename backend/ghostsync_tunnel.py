@@ -0,0 +1,387 @@
+"""
+GhostSync tunnels - pooled Cloudflare quick tunnels, one per local port.
+"""
+
+import asyncio
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+log = logging.getLogger("GhostSync")
+
+URL_PATTERN = re.compile(r'https://[a-zA-Z0-9-]+\.trycloudflare\.com')
+# cloudflared log lines look like "2024-05-01T10:00:00Z INF Registered tunnel connection ..."
+LOG_PATTERN = re.compile(r'^(?:(\S+T\S+)\s+)?(DBG|INF|WRN|ERR|FTL)\s+(.*)$')
+
+DEFAULT_DEV_PORTS = "3000-3002,5173,5174,8000,8080"
+
+# ==============================================================================
+# DEV SERVER DISCOVERY
+# ==============================================================================
+def parse_ports(spec: str) -> list:
+    """'3000-3002,5173' -> [3000, 3001, 3002, 5173], order kept as priority."""
+    ports = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        try:
+            if "-" in part:
+                lo, hi = (int(v) for v in part.split("-", 1))
+                ports.extend(range(lo, hi + 1))
+            elif part:
+                ports.append(int(part))
+        except ValueError:
+            continue
+    return list(dict.fromkeys(p for p in ports if 0 < p < 65536))
+
+
+class PortDiscovery:
+    """
+    Finds a running dev server among candidate ports.
+
+    Listening sockets are read from the OS table and matched per line
+    (netstat on Windows, /proc/net/tcp and tcp6 elsewhere; both address
+    families), then the candidates are confirmed with concurrent asyncio
+    connects to every loopback host (dev servers on `localhost` often bind
+    only ::1). Results are cached for `ttl` seconds so back-to-back prompts
+    don't rescan.
+    """
+
+    def __init__(self, ttl: float = 5.0, connect_timeout: float = 0.3,
+                 hosts: tuple = ("127.0.0.1", "::1")):
+        self.ttl = ttl
+        self.connect_timeout = connect_timeout
+        self.hosts = hosts
+        self._cache = {}  # key -> (timestamp, value)
+
+    def _cached(self, key):
+        hit = self._cache.get(key)
+        if hit and time.monotonic() - hit[0] < self.ttl: return True, hit[1]
+        return False, None
+
+    def _store(self, key, value):
+        self._cache[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def listening_ports(self) -> Optional[set]:
+        """TCP ports in LISTEN state, or None if the table can't be read."""
+        found, value = self._cached("listening")
+        if found: return value
+        try:
+            ports = self._read_netstat() if sys.platform == "win32" else self._read_proc_net()
+        except Exception as e:
+            log.debug(f"Listening-socket table unavailable: {e}")
+            ports = None
+        return self._store("listening", ports)
+
+    @staticmethod
+    def _read_netstat() -> set:
+        # no -p filter: "-p TCP" lists IPv4 sockets only
+        out = subprocess.run(["netstat", "-ano"], capture_output=True, text=True,
+                             timeout=5, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)).stdout
+        ports = set()
+        for line in out.splitlines():
+            parts = line.split()
+            # "TCP  0.0.0.0:3000  0.0.0.0:0  LISTENING  1234" or
+            # "TCP  [::1]:5173  [::]:0  LISTENING  1234" - a :0 foreign
+            # address also marks listeners on localized Windows
+            if len(parts) >= 4 and parts[0] == "TCP" and (parts[3] == "LISTENING" or parts[2].endswith(":0")):
+                try:
+                    ports.add(int(parts[1].rsplit(":", 1)[1]))
+                except ValueError:
+                    pass
+        return ports
+
+    @staticmethod
+    def _read_proc_net() -> set:
+        ports = set()
+        for name in ("/proc/net/tcp", "/proc/net/tcp6"):
+            try:
+                lines = Path(name).read_text().splitlines()[1:]
+            except OSError:
+                continue
+            for line in lines:
+                parts = line.split()
+                if len(parts) > 3 and parts[3] == "0A":  # TCP_LISTEN
+                    ports.add(int(parts[1].rsplit(":", 1)[1], 16))
+        return ports
+
+    async def probe(self, ports: list) -> list:
+        """Ports (in the given order) that accept a TCP connection on any host, probed concurrently."""
+        async def connects(host, port):
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.connect_timeout)
+                writer.close()
+                return True
+            except (OSError, asyncio.TimeoutError):
+                return False
+
+        async def accepts(port):
+            return any(await asyncio.gather(*(connects(h, port) for h in self.hosts)))
+        results = await asyncio.gather(*(accepts(p) for p in ports))
+        return [p for p, ok in zip(ports, results) if ok]
+
+    async def discover(self, ports: Optional[list] = None) -> Optional[int]:
+        """First candidate port with a live server, by priority order."""
+        ports = list(ports or parse_ports(DEFAULT_DEV_PORTS))
+        key = ("discover", tuple(ports))
+        found, value = self._cached(key)
+        if found: return value
+        listening = await asyncio.to_thread(self.listening_ports)
+        candidates = [p for p in ports if p in listening] if listening is not None else ports
+        live = await self.probe(candidates) if candidates else []
+        return self._store(key, live[0] if live else None)
+
+    def discover_sync(self, ports: Optional[list] = None) -> Optional[int]:
+        return asyncio.run(self.discover(ports))
+
+    async def wait_for_port(self, port: int, timeout: float = 10.0, interval: float = 0.25) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            if await self.probe([port]): return True
+            if time.monotonic() >= deadline: return False
+            await asyncio.sleep(interval)
+
+# ==============================================================================
+# PROCESS SUPERVISOR
+# ==============================================================================
+class TunnelSupervisor:
+    """
+    Owns one cloudflared process.
+
+    A background reader drains stdout for the whole life of the process (so
+    the pipe can never fill and stall it), parses each line into an event,
+    and resolves `url_future` when the public URL shows up. If the process
+    dies unexpectedly it is restarted, up to `max_restarts` times.
+    """
+
+    def __init__(self, command: list, port: int, max_restarts: int = 3,
+                 restart_delay: float = 2.0, history: int = 200):
+        self.command = command
+        self.port = port
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.events = deque(maxlen=history)  # {"time", "level", "message"}
+        self.url = None
+        self.url_future = Future()
+        self.process = None
+        self.restarts = 0
+        self.failed = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"GhostSync-Tunnel-{self.port}", daemon=True)
+        self._thread.start()
+
+    def wait_url(self, timeout: float) -> Optional[str]:
+        """Block until the URL is known (or timeout / failure); None if it never came."""
+        try:
+            return self.url_future.result(timeout=timeout)
+        except (FutureTimeout, Exception):
+            return None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive()) and not self.failed
+
+    def stop(self):
+        self._stopped.set()
+        proc = self.process
+        if proc and proc.poll() is None:
+            try:
+                proc.terminate()
+                proc.wait(timeout=5)
+            except Exception:
+                try: proc.kill()
+                except Exception: pass
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.process = subprocess.Popen(
+                    self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                    creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+                )
+            except OSError as e:
+                self._event("ERR", f"spawn failed: {e}")
+                self._fail(e)
+                return
+
+            for line in self.process.stdout:
+                self._handle_line(line)
+            code = self.process.wait()
+            if self._stopped.is_set(): return
+
+            self._event("ERR", f"cloudflared exited with code {code}")
+            if self.restarts >= self.max_restarts:
+                self._fail(RuntimeError(f"cloudflared for port {self.port} crashed {self.restarts + 1} times"))
+                return
+            self.restarts += 1
+            log.warning(f"Tunnel for port {self.port} crashed (code {code}), restart {self.restarts}/{self.max_restarts}")
+            self.url = None
+            if self.url_future.done(): self.url_future = Future()
+            if self._stopped.wait(self.restart_delay * self.restarts): return
+
+    def _handle_line(self, line: str):
+        line = line.strip()
+        if not line: return
+        match = LOG_PATTERN.match(line)
+        level, message = (match.group(2), match.group(3)) if match else ("INF", line)
+        self._event(level, message)
+        url = URL_PATTERN.search(line)
+        if url:
+            self.url = url.group(0)
+            if not self.url_future.done(): self.url_future.set_result(self.url)
+            log.info(f"Tunnel for port {self.port} is up: {self.url}")
+
+    def _event(self, level: str, message: str):
+        self.events.append({"time": datetime.now(), "level": level, "message": message})
+        if level in ("ERR", "FTL"):
+            log.warning(f"cloudflared[{self.port}] {message}")
+
+    def _fail(self, exc: Exception):
+        self.failed = True
+        if not self.url_future.done(): self.url_future.set_exception(exc)
+
+# ==============================================================================
+# SECURE CLOUDFLARE TUNNEL POOL
+# ==============================================================================
+class SecureTunnel:
+    """
+    Keeps one warm, supervised cloudflared process per port.
+
+    create_tunnel() returns the existing URL while the pooled process is
+    alive, so repeated prompts on the same port get the same public URL
+    instantly. Tunnels unused for `idle_timeout` seconds are evicted by a
+    background reaper.
+    """
+
+    CLOUDFLARED_PATH = Path(__file__).parent / "cloudflared.exe"
+
+    def __init__(self, idle_timeout: float = 30 * 60, reap_interval: float = 60,
+                 url_timeout: float = 30, executable: Optional[list] = None):
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self.url_timeout = url_timeout
+        # Override to run a stand-in (e.g. [sys.executable, "fake_cloudflared.py"])
+        self.executable = executable
+        self.processes = {}  # port -> {"supervisor", "url", "created", "last_used"}
+        self._lock = threading.Lock()
+        self._port_locks = defaultdict(threading.Lock)
+        self._reaper = None
+        self.discovery = PortDiscovery()
+
+    def ensure_cloudflared(self) -> bool:
+        if self.executable or self.CLOUDFLARED_PATH.exists(): return True
+        log.info("Downloading cloudflared...")
+        try:
+            import urllib.request
+            url = "https://github.com/cloudflare/cloudflared/releases/latest/download/cloudflared-windows-amd64.exe"
+            urllib.request.urlretrieve(url, str(self.CLOUDFLARED_PATH))
+            return True
+        except Exception as e:
+            log.error(f"Download failed: {e}")
+            return False
+
+    def create_tunnel(self, port: int) -> Optional[str]:
+        """Public URL for `port`, reusing a live pooled tunnel when there is one."""
+        with self._port_locks[port]:
+            entry = self._healthy_entry(port)
+            if entry:
+                entry["last_used"] = datetime.now()
+                # After a crash-restart the URL changes; wait for the new one
+                url = entry["supervisor"].wait_url(self.url_timeout)
+                if url:
+                    entry["url"] = url
+                    log.info(f"Reusing tunnel for port {port}: {url}")
+                    return url
+                self.close(port)
+
+            if not self.ensure_cloudflared(): return None
+            entry = self._spawn(port)
+            if not entry: return None
+            with self._lock:
+                self.processes[port] = entry
+            self._start_reaper()
+            return entry["url"]
+
+    def _spawn(self, port: int) -> Optional[dict]:
+        executable = self.executable or [str(self.CLOUDFLARED_PATH)]
+        log.info(f"Creating tunnel for port {port}...")
+        supervisor = TunnelSupervisor(executable + ["tunnel", "--url", f"http://localhost:{port}"], port)
+        supervisor.start()
+        url = supervisor.wait_url(self.url_timeout)
+        if not url:
+            log.error(f"Tunnel for port {port}: no URL within {self.url_timeout}s")
+            supervisor.stop()
+            return None
+        now = datetime.now()
+        return {"supervisor": supervisor, "url": url, "created": now, "last_used": now}
+
+    def _healthy_entry(self, port: int) -> Optional[dict]:
+        with self._lock:
+            entry = self.processes.get(port)
+            if entry and not entry["supervisor"].running:
+                log.warning(f"Tunnel for port {port} is gone (gave up restarting), dropping it")
+                del self.processes[port]
+                return None
+            return entry
+
+    def list_tunnels(self) -> list:
+        """Snapshot of live tunnels: [{"port", "url", "created", "last_used"}]."""
+        for port in list(self.processes):
+            self._healthy_entry(port)
+        with self._lock:
+            return [{"port": port, "url": e["supervisor"].url or e["url"], "created": e["created"],
+                     "last_used": e["last_used"], "restarts": e["supervisor"].restarts}
+                    for port, e in sorted(self.processes.items())]
+
+    def close(self, port: int) -> bool:
+        with self._lock:
+            entry = self.processes.pop(port, None)
+        if not entry: return False
+        entry["supervisor"].stop()
+        log.info(f"Closed tunnel for port {port}")
+        return True
+
+    def evict_idle(self) -> list:
+        """Close tunnels that are dead or unused for longer than idle_timeout."""
+        now = datetime.now()
+        evicted = []
+        for port in list(self.processes):
+            entry = self._healthy_entry(port)
+            if entry and (now - entry["last_used"]).total_seconds() > self.idle_timeout:
+                self.close(port)
+                evicted.append(port)
+        if evicted: log.info(f"Evicted idle tunnels: {evicted}")
+        return evicted
+
+    def _start_reaper(self):
+        if self._reaper and self._reaper.is_alive(): return
+        def reap():
+            while self.processes:
+                time.sleep(self.reap_interval)
+                self.evict_idle()
+        self._reaper = threading.Thread(target=reap, name="GhostSync-TunnelReaper", daemon=True)
+        self._reaper.start()
+
+    def is_port_open(self, port: int) -> bool:
+        return bool(asyncio.run(self.discovery.probe([port])))
+
+    def detect_dev_server(self, ports: Optional[list] = None) -> Optional[int]:
+        return self.discovery.discover_sync(ports)
+
+    def kill_all(self):
+        for port in list(self.processes.keys()):
+            self.close(port)
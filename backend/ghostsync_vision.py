@@ -0,0 +1,155 @@
+"""
+GhostSync vision helpers - frame analysis for the automation loop.
+
+Pure PIL + NumPy (no Windows APIs) so it can be benchmarked headless.
+"""
+
+import time
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+# ==============================================================================
+# ACCEPT / DENY BUTTON SCANNER
+# ==============================================================================
+class ButtonScanner:
+    """
+    Finds the green (Accept) and red (Deny) buttons of an Antigravity prompt.
+
+    The search box is sampled on a `step` pixel grid by a nearest-neighbour
+    downscale, and the whole grid is classified in one NumPy pass. The box
+    around the last hit is remembered and scanned first.
+    """
+
+    def __init__(self, step: int = 20, search_left: float = 0.5, search_top: float = 0.2,
+                 region_margin: int = 120):
+        self.step = step
+        self.search_left = search_left
+        self.search_top = search_top
+        self.region_margin = region_margin
+        self.last_region = None  # (left, top, right, bottom) in frame pixels
+
+    def scan(self, frame: Image.Image) -> Optional[dict]:
+        width, height = frame.size
+        if self.last_region:
+            hit = self._scan_box(frame, self._clip(self.last_region, width, height))
+            if hit: return hit
+
+        box = (int(width * self.search_left), int(height * self.search_top), width, height)
+        hit = self._scan_box(frame, box)
+        if hit:
+            xs = (hit["accept_pos"][0], hit["deny_pos"][0])
+            ys = (hit["accept_pos"][1], hit["deny_pos"][1])
+            m = self.region_margin
+            self.last_region = (min(xs) - m, min(ys) - m, max(xs) + m, max(ys) + m)
+        return hit
+
+    def reset(self):
+        self.last_region = None
+
+    @staticmethod
+    def _clip(box, width, height):
+        left, top, right, bottom = box
+        return (max(0, left), max(0, top), min(width, right), min(height, bottom))
+
+    def _scan_box(self, frame: Image.Image, box) -> Optional[dict]:
+        left, top, right, bottom = box
+        cols = (right - left) // self.step
+        rows = (bottom - top) // self.step
+        if cols <= 0 or rows <= 0: return None
+
+        # Nearest-neighbour downscale of the box == sampling the grid, done in C by PIL
+        grid = frame.resize((cols, rows), Image.NEAREST, box=box)
+        if grid.mode != "RGB": grid = grid.convert("RGB")
+        rgb = np.asarray(grid, dtype=np.int16)
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+        # Same thresholds as the original pixel loop (x > y * 1.5  <=>  2x > 3y)
+        green = (g > 150) & (2 * g > 3 * r) & (2 * g > 3 * b)
+        red = (r > 150) & (2 * r > 3 * g) & (2 * r > 3 * b)
+        if not green.any() or not red.any(): return None
+
+        scale_x = (right - left) / cols
+        scale_y = (bottom - top) / rows
+
+        def to_frame(mask):
+            row, col = divmod(int(mask.argmax()), cols)
+            return (left + int((col + 0.5) * scale_x), top + int((row + 0.5) * scale_y))
+
+        return {"accept_pos": to_frame(green), "deny_pos": to_frame(red)}
+
+# ==============================================================================
+# FRAME SIGNATURES / STABILITY
+# ==============================================================================
+def parse_regions(spec: str) -> list:
+    """Parse 'l,t,r,b;l,t,r,b' (fractions of the frame) into a list of boxes."""
+    regions = []
+    for part in (spec or "").split(";"):
+        try:
+            left, top, right, bottom = (float(v) for v in part.split(","))
+            regions.append((left, top, right, bottom))
+        except ValueError:
+            continue
+    return regions
+
+
+class StabilityTracker:
+    """
+    Decides when the screen has settled, using small grayscale signatures.
+
+    Every frame is reduced to a `grid` thumbnail (one cell per block of the
+    screen). A frame counts as changed when at least `min_changed_cells`
+    unmasked cells differ from the reference by more than `pixel_delta` grey
+    levels, so a blinking cursor or the taskbar clock does not reset the
+    stability timer. `ignore` holds fractional (l, t, r, b) boxes to mask.
+    """
+
+    def __init__(self, grid=(96, 54), pixel_delta: int = 12, min_changed_cells: int = 2,
+                 ignore: Optional[list] = None):
+        self.grid = grid
+        self.pixel_delta = pixel_delta
+        self.min_changed_cells = min_changed_cells
+        self.mask = np.ones((grid[1], grid[0]), dtype=bool)
+        for left, top, right, bottom in ignore or []:
+            self.mask[int(top * grid[1]):int(np.ceil(bottom * grid[1])),
+                      int(left * grid[0]):int(np.ceil(right * grid[0]))] = False
+        self.reference = None
+        self.changed_at = None
+
+    def signature(self, frame: Image.Image) -> np.ndarray:
+        thumb = frame.resize(self.grid, Image.BOX, reducing_gap=3.0).convert("L")
+        return np.asarray(thumb, dtype=np.int16)
+
+    def changed_cells(self, a: np.ndarray, b: np.ndarray) -> int:
+        return int(np.count_nonzero((np.abs(a - b) > self.pixel_delta) & self.mask))
+
+    def observe(self, frame: Image.Image, now: Optional[float] = None) -> bool:
+        """Feed a frame; returns True if it differs from the reference."""
+        now = time.time() if now is None else now
+        sig = self.signature(frame)
+        if self.reference is None or self.changed_cells(self.reference, sig) >= self.min_changed_cells:
+            self.reference = sig
+            self.changed_at = now
+            return True
+        return False
+
+    def stable_for(self, now: Optional[float] = None) -> float:
+        """Seconds since the last meaningful change (0 before the first frame)."""
+        if self.changed_at is None: return 0.0
+        return (time.time() if now is None else now) - self.changed_at
+
+# ==============================================================================
+# COORDINATES
+# ==============================================================================
+def sub_box(box: tuple, region: tuple) -> tuple:
+    """Apply a fractional (l, t, r, b) region to an absolute (l, t, r, b) box."""
+    left, top, right, bottom = box
+    width, height = right - left, bottom - top
+    return (left + int(width * region[0]), top + int(height * region[1]),
+            left + int(width * region[2]), top + int(height * region[3]))
+
+
+def translate_hit(hit: dict, origin: tuple) -> dict:
+    """Shift every (x, y) position of a detection from frame to screen space."""
+    return {key: (pos[0] + origin[0], pos[1] + origin[1]) for key, pos in hit.items()}
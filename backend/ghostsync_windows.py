@@ -0,0 +1,246 @@
+"""
+GhostSync windows - top-level window registry fed by window events.
+
+The registry is updated incrementally (create / show / hide / destroy /
+title change) instead of enumerating every window on each lookup. On
+Windows the events come from SetWinEventHook on a dedicated thread; any
+other source (FakeEventSource on Linux, benchmarks) calls the same
+update / remove methods.
+"""
+
+import asyncio
+import ctypes
+import logging
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+log = logging.getLogger("GhostSync")
+
+# ==============================================================================
+# REGISTRY
+# ==============================================================================
+class WindowRegistry:
+    """
+    hwnd -> title of the visible top-level windows whose title passes
+    `match`. Thread-safe: events arrive on the hook thread, lookups come
+    from the bot loop and the automation thread.
+    """
+
+    def __init__(self, match: Callable[[str], bool]):
+        self.match = match
+        self.windows = {}  # hwnd -> title
+        self.events = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def update(self, hwnd: int, title: str, visible: bool = True):
+        """A window was created, shown or renamed."""
+        keep = visible and bool(title) and self.match(title)
+        with self._lock:
+            self.events += 1
+            if keep:
+                changed = self.windows.get(hwnd) != title
+                self.windows[hwnd] = title
+            else:
+                changed = self.windows.pop(hwnd, None) is not None
+        if changed: self._notify()
+
+    def remove(self, hwnd: int):
+        """A window was hidden or destroyed."""
+        with self._lock:
+            self.events += 1
+            changed = self.windows.pop(hwnd, None) is not None
+        if changed: self._notify()
+
+    def seed(self, windows: list):
+        """Initial state: [(hwnd, title)] from one full enumeration."""
+        with self._lock:
+            self.windows = {hwnd: title for hwnd, title in windows if title and self.match(title)}
+        self._notify()
+
+    def list(self) -> list:
+        with self._lock:
+            return list(self.windows.items())
+
+    def title(self, hwnd: int) -> Optional[str]:
+        return self.windows.get(hwnd)
+
+    def __contains__(self, hwnd) -> bool:
+        return hwnd in self.windows
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    # ---- waiting ----
+    def subscribe(self, fn: Callable[[], None]):
+        self._listeners.append(fn)
+
+    def unsubscribe(self, fn: Callable[[], None]):
+        if fn in self._listeners: self._listeners.remove(fn)
+
+    def _notify(self):
+        for fn in list(self._listeners):
+            try:
+                fn()
+            except Exception as e:
+                log.debug(f"Window listener failed: {e}")
+
+    async def wait_for(self, fn: Callable[[], object], timeout: float):
+        """
+        Re-evaluate `fn()` after every registry change until it returns
+        something truthy (returned) or `timeout` passes (returns None).
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        wake = lambda: loop.call_soon_threadsafe(changed.set)
+        self.subscribe(wake)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                changed.clear()
+                result = fn()
+                if result: return result
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return None
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.unsubscribe(wake)
+
+# ==============================================================================
+# WIN32 ENUMERATION
+# ==============================================================================
+_WNDENUMPROC = None
+
+def enum_windows(user32, match: Callable[[str], bool]) -> list:
+    """[(hwnd, title)] of visible top-level windows whose title passes `match`."""
+    global _WNDENUMPROC
+    if _WNDENUMPROC is None:  # built once, not per call
+        _WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.c_int, ctypes.c_int)
+    windows = []
+    def enum_callback(hwnd, _):
+        if user32.IsWindowVisible(hwnd):
+            title = window_text(user32, hwnd)
+            if title and match(title): windows.append((hwnd, title))
+        return True
+    user32.EnumWindows(_WNDENUMPROC(enum_callback), 0)
+    return windows
+
+def window_text(user32, hwnd: int) -> str:
+    length = user32.GetWindowTextLengthW(hwnd)
+    if length <= 0: return ""
+    buf = ctypes.create_unicode_buffer(length + 1)
+    user32.GetWindowTextW(hwnd, buf, length + 1)
+    return buf.value
+
+# ==============================================================================
+# EVENT SOURCES
+# ==============================================================================
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+GA_ROOT = 2
+WM_QUIT = 0x0012
+
+
+class WinEventSource:
+    """
+    SetWinEventHook on a dedicated thread with its own message loop (out-of-
+    context hooks are delivered through it). The registry is seeded with one
+    EnumWindows pass, then only changes arrive.
+    """
+
+    def __init__(self, registry: WindowRegistry):
+        self.registry = registry
+        self.thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self._ok = False
+
+    def start(self, timeout: float = 2.0) -> bool:
+        if sys.platform != "win32": return False
+        self.thread = threading.Thread(target=self._run, name="GhostSync-WinEvents", daemon=True)
+        self.thread.start()
+        self._ready.wait(timeout)
+        return self._ok
+
+    def stop(self):
+        if self._thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+            self._thread_id = None
+
+    def _run(self):
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        WINEVENTPROC = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WINEVENTPROC,
+                                           wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]
+        user32.GetAncestor.restype = wintypes.HWND
+        user32.GetAncestor.argtypes = [wintypes.HWND, wintypes.UINT]
+        registry = self.registry
+
+        def on_event(hook, event, hwnd, id_object, id_child, thread_id, ms):
+            if id_object != OBJID_WINDOW or id_child != 0 or not hwnd: return
+            if event in (EVENT_OBJECT_DESTROY, EVENT_OBJECT_HIDE):
+                registry.remove(hwnd)
+            elif user32.GetAncestor(hwnd, GA_ROOT) == hwnd:
+                registry.update(hwnd, window_text(user32, hwnd), bool(user32.IsWindowVisible(hwnd)))
+
+        proc = WINEVENTPROC(on_event)  # referenced for the hook's lifetime
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        hooks = [user32.SetWinEventHook(EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE, None, proc, 0, 0, flags),
+                 user32.SetWinEventHook(EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE, None, proc, 0, 0, flags)]
+        if not all(hooks):
+            log.warning("Window events unavailable (SetWinEventHook failed); falling back to enumeration")
+            for hook in filter(None, hooks): user32.UnhookWinEvent(hook)
+            self._ready.set()
+            return
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        registry.seed(enum_windows(user32, registry.match))
+        self._ok = True
+        self._ready.set()
+        log.info(f"Window events hooked ({len(registry)} tracked)")
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks: user32.UnhookWinEvent(hook)
+
+
+class FakeEventSource:
+    """Drives a registry by hand, the way WinEventSource does (Linux, benchmarks)."""
+
+    def __init__(self, registry: WindowRegistry, windows: Optional[list] = None):
+        self.registry = registry
+        self.initial = windows or []
+
+    def start(self) -> bool:
+        self.registry.seed(self.initial)
+        return True
+
+    def stop(self):
+        pass
+
+    def create(self, hwnd: int, title: str):
+        self.registry.update(hwnd, title)
+
+    def rename(self, hwnd: int, title: str):
+        self.registry.update(hwnd, title)
+
+    def hide(self, hwnd: int):
+        self.registry.remove(hwnd)
+
+    def destroy(self, hwnd: int):
+        self.registry.remove(hwnd)